@@ -7,11 +7,372 @@ Fetches 2 years of historical data + analyst targets from yfinance
 import yfinance as yf
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import requests
+import os
+import re
+import pickle
+import hashlib
+import asyncio
+from functools import lru_cache, reduce
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime, timedelta, date
 import time
 import logging
 from typing import Dict, List, Tuple, Optional
 
+# The Arrow CSV reader (multithreaded, Arrow-backed strings) needs pandas >= 2.0 and pyarrow
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_CSV = int(pd.__version__.split('.')[0]) >= 2
+except ImportError:
+    PYARROW_CSV = False
+
+# Optional async HTTP client for large universe fetches (HTTP/2 only when h2 is installed too)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+    try:
+        import h2  # noqa: F401
+        HTTP2_AVAILABLE = True
+    except ImportError:
+        HTTP2_AVAILABLE = False
+except ImportError:
+    HTTPX_AVAILABLE = False
+    HTTP2_AVAILABLE = False
+
+# yfinance's own transport (browser-impersonating curl_cffi session); Yahoo throttles plain clients
+try:
+    import curl_cffi  # noqa: F401
+    CURL_CFFI_AVAILABLE = True
+except ImportError:
+    CURL_CFFI_AVAILABLE = False
+
+# Optional JIT for the per-symbol return statistics kernel
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+YAHOO_CHART_URL = "https://query2.finance.yahoo.com/v8/finance/chart/{symbol}"
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/120.0 Safari/537.36')
+
+def parse_european_numbers(values: pd.Series) -> pd.Series:
+    """
+    Vectorized European number parsing (1.234,56 -> 1234.56) for a whole column
+    
+    Same rules as MarketDataCollector.parse_european_number: when a comma is present
+    dots are thousands separators and the comma is the decimal point; otherwise the
+    value is parsed as-is. Blank or unparseable cells become 0.0.
+    """
+    text = values.astype(str).str.strip()
+    has_comma = text.str.contains(',', regex=False)
+    text = text.where(~has_comma, text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    return pd.to_numeric(text, errors='coerce').fillna(0.0).astype(float)
+
+def clean_portfolio_symbols(simbolo: pd.Series) -> pd.Series:
+    """Tickers from the broker export's Simbolo column (exchange suffix and European listing '1' prefix removed)"""
+    symbols = simbolo.str.split('.', n=1).str[0]
+    return symbols.where(~symbols.str.startswith('1'), symbols.str[1:])
+
+def portfolio_frame(df: pd.DataFrame, number_columns: Dict[str, str]) -> pd.DataFrame:
+    """
+    Position rows of a broker portfolio export as one frame
+    
+    Drops blank symbols and the 'Totale' line, cleans the symbols and parses the
+    European-formatted number columns in one vectorized pass each.
+    
+    Args:
+        df: Export rows (Simbolo, Titolo and the number columns)
+        number_columns: Output column name -> export column name
+        
+    Returns:
+        DataFrame with symbol, name and the parsed number columns (export row index)
+    """
+    df = df[df['Simbolo'].notna() & (df['Simbolo'] != 'Totale')]
+    return pd.DataFrame({
+        'symbol': clean_portfolio_symbols(df['Simbolo']),
+        'name': df['Titolo'],
+        **{column: parse_european_numbers(df[source]) for column, source in number_columns.items()}
+    })
+
+def simple_returns(close: pd.Series) -> pd.Series:
+    """
+    Daily simple returns computed on the raw float64 array
+    
+    Equivalent to close.pct_change().dropna() without pandas' label-aware path.
+    """
+    close = close.dropna()
+    values = close.to_numpy(dtype=np.float64)
+    return pd.Series(values[1:] / values[:-1] - 1.0, index=close.index[1:])
+
+def top_k_weight(weights, k: int = 5) -> float:
+    """Combined weight of the k largest positions (partial selection, no full sort)"""
+    w = np.asarray(weights, dtype=np.float64)
+    w = w[~np.isnan(w)]
+    k = min(k, w.size)
+    if k == 0:
+        return 0.0
+    return float(np.partition(w, w.size - k)[w.size - k:].sum())
+
+if NUMBA_AVAILABLE:
+    # fastmath without 'nnan'/'ninf' so the isfinite checks on the NaN padding still hold
+    @njit(parallel=True, cache=True, fastmath={'contract', 'arcp', 'reassoc'})
+    def _compute_stats(closes, ann):
+        """Annualized mean/volatility of daily returns per row of a NaN-padded close matrix"""
+        n_sym, n_t = closes.shape
+        means = np.full(n_sym, np.nan)
+        vols = np.full(n_sym, np.nan)
+        counts = np.zeros(n_sym, dtype=np.int64)
+        
+        for i in prange(n_sym):
+            # Welford's single-pass mean/M2 update, no per-row returns buffer
+            n = 0
+            mean = 0.0
+            m2 = 0.0
+            for t in range(1, n_t):
+                prev = closes[i, t - 1]
+                cur = closes[i, t]
+                if np.isfinite(prev) and np.isfinite(cur):
+                    r = np.float64(cur) / np.float64(prev) - 1.0
+                    n += 1
+                    delta = r - mean
+                    mean += delta / n
+                    m2 += delta * (r - mean)
+            
+            counts[i] = n
+            if n > 1:
+                means[i] = mean * ann
+                vols[i] = np.sqrt(m2 / (n - 1) * ann)
+        
+        return means, vols, counts
+
+def annualized_return_stats(close_arrays: List[np.ndarray], periods_per_year: int = 252,
+                            dtype=np.float64) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Annualized mean return and volatility (ddof=1) for many close-price series at once
+    
+    The series are stacked into one NaN-padded matrix (one contiguous row per series)
+    and reduced in a single parallel numba kernel, or with vectorized NumPy when numba
+    is missing. dtype=np.float32 halves the stacked matrix for universe-scale screens;
+    returns and reductions are always evaluated in float64.
+    
+    Returns:
+        Tuple of (annual means, annual volatilities, number of daily returns) per series
+    """
+    n_t = max((len(closes) for closes in close_arrays), default=0)
+    matrix = np.full((len(close_arrays), n_t), np.nan, dtype=dtype)
+    for i, closes in enumerate(close_arrays):
+        matrix[i, :len(closes)] = closes
+    
+    if NUMBA_AVAILABLE:
+        return _compute_stats(matrix, float(periods_per_year))
+    
+    # Work in one returns buffer (updated in place) instead of a temporary per step
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.divide(matrix[:, 1:], matrix[:, :-1], dtype=np.float64)
+        returns -= 1.0
+        missing = ~np.isfinite(returns)
+        counts = returns.shape[1] - missing.sum(axis=1)
+        
+        returns[missing] = 0.0
+        means = returns.sum(axis=1) / counts
+        returns -= means[:, None]
+        returns[missing] = 0.0
+        np.square(returns, out=returns)
+        var = returns.sum(axis=1) / (counts - 1)
+    means = np.where(counts > 1, means * periods_per_year, np.nan)
+    vols = np.where(counts > 1, np.sqrt(var * periods_per_year), np.nan)
+    return means, vols, counts
+
+# One-pass parse of a European (1.234,56 / 12,5 / ,5 / 1.234,) or plain (1234.56) number:
+# groups are sign, euro integer part (dots are thousands separators wherever they sit),
+# euro decimals, plain integer part, plain decimals
+_EURO_RE = re.compile(r'^\s*([+-]?)(?:([\d.]*),(\d*)|(\d+)(?:\.(\d+))?)\s*$')
+
+# Fields of ticker.info read downstream; everything else is dropped right after fetching.
+# Readers of MarketDataCollector's data['info']: the analyst targets/recommendation extraction
+# below and PositionSizer (longName as the recommendation name) - extend this before reading more
+_INFO_KEYS = ('longName', 'targetLowPrice', 'targetMeanPrice', 'targetHighPrice', 'recommendationKey',
+              'recommendationMean', 'sector', 'industry', 'marketCap')
+
+# Fallback HTTP session for yfinance calls when curl_cffi is missing (see get_yfinance_session)
+_YF_SESSION = None
+
+def get_yfinance_session() -> Optional[requests.Session]:
+    """
+    Return the session to pass to yfinance calls
+    
+    With curl_cffi installed this is None: yfinance then keeps its own pooled,
+    browser-impersonating session, which Yahoo does not rate-limit the way it
+    does plain clients, and handing it any other session would replace that
+    transport for the whole process. Without curl_cffi a process-wide
+    requests.Session is returned, with pooled keep-alive connections and
+    429/5xx retries with backoff.
+    """
+    global _YF_SESSION
+    
+    if CURL_CFFI_AVAILABLE:
+        return None
+    
+    if _YF_SESSION is None:
+        session = requests.Session()
+        session.headers.update({'User-Agent': USER_AGENT})
+        
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        
+        _YF_SESSION = session
+    
+    return _YF_SESSION
+
+# Sessions are unhashable, so the ticker cache is keyed on id(session) and resolved here
+_SESSIONS = {}
+
+@lru_cache(maxsize=512)
+def _get_ticker(symbol: str, session_id: int) -> yf.Ticker:
+    """Build (once per symbol/session) the yf.Ticker for symbol"""
+    return yf.Ticker(symbol, session=_SESSIONS[session_id])
+
+def get_ticker(symbol: str, session=None) -> yf.Ticker:
+    """
+    Return a memoized yf.Ticker so repeated lookups within a run share one object
+    (and yfinance's own per-ticker caches). Use _get_ticker.cache_clear() to reset.
+    """
+    _SESSIONS[id(session)] = session
+    return _get_ticker(symbol, id(session))
+
+# On-disk cache for yfinance responses, so re-runs on the same day skip the network
+MARKET_DATA_CACHE_DIR = os.path.join('.cache', 'market_data')
+HISTORY_CACHE_TTL = 24 * 3600       # Daily bars only change once per trading day
+INFO_CACHE_TTL = 7 * 24 * 3600      # Analyst targets / company info move slowly
+
+def _cache_file(*key_parts) -> str:
+    """Path of the cache entry for the given key parts"""
+    key = hashlib.md5('|'.join(str(part) for part in key_parts).encode()).hexdigest()
+    return os.path.join(MARKET_DATA_CACHE_DIR, f"{key}.pkl")
+
+def _read_cache(path: str, ttl: float):
+    """Return cached data if the entry exists and is younger than ttl seconds, else None"""
+    try:
+        with open(path, 'rb') as f:
+            entry = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    
+    if time.time() - entry['ts'] < ttl:
+        return entry['data']
+    return None
+
+def _write_cache(path: str, data) -> None:
+    """Atomically store data with the current timestamp"""
+    os.makedirs(MARKET_DATA_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'ts': time.time(), 'data': data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def _history_cache_file(symbol: str, period: str) -> str:
+    """History entries are keyed per day so they roll over with each new trading session"""
+    return _cache_file('history', symbol, period, date.today())
+
+def cached_history(symbol: str, period: str, session=None) -> pd.DataFrame:
+    """Fetch ticker.history(period) through the on-disk cache (keyed per day)"""
+    path = _history_cache_file(symbol, period)
+    hist = _read_cache(path, HISTORY_CACHE_TTL)
+    
+    if hist is None:
+        hist = get_ticker(symbol, session).history(period=period)
+        if not hist.empty:
+            _write_cache(path, hist)
+    
+    return hist
+
+def download_histories(symbols: List[str], period: str, session=None) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch daily histories for many symbols at once
+    
+    Symbols already in the disk cache are served from it; the rest are fetched in a
+    single multi-ticker yf.download call (one chart request batch instead of one
+    ticker.history round trip per symbol) and written back to the cache.
+    
+    Returns:
+        Dict mapping symbol to its history (empty DataFrame when Yahoo had no data)
+    """
+    histories = {}
+    missing = []
+    
+    for symbol in symbols:
+        hist = _read_cache(_history_cache_file(symbol, period), HISTORY_CACHE_TTL)
+        if hist is None:
+            missing.append(symbol)
+        else:
+            histories[symbol] = hist
+    
+    if not missing:
+        return histories
+    
+    # auto_adjust/ignore_tz match ticker.history() so cached and downloaded frames are interchangeable
+    bulk = yf.download(tickers=' '.join(missing), period=period, group_by='ticker', auto_adjust=True,
+                       ignore_tz=False, threads=True, progress=False, session=session)
+    if bulk is None:
+        bulk = pd.DataFrame()
+    
+    downloaded = set(bulk.columns.get_level_values(0)) if isinstance(bulk.columns, pd.MultiIndex) else set()
+    
+    for symbol in missing:
+        if symbol in downloaded:
+            hist = bulk[symbol].dropna(how='all')
+        elif len(missing) == 1 and not isinstance(bulk.columns, pd.MultiIndex):
+            hist = bulk.dropna(how='all')  # Older yfinance returns flat columns for a single ticker
+        else:
+            hist = pd.DataFrame()
+        
+        histories[symbol] = hist
+        if not hist.empty:
+            _write_cache(_history_cache_file(symbol, period), hist)
+    
+    return histories
+
+def cached_info(symbol: str, session=None) -> Dict:
+    """Fetch ticker.info through the on-disk cache"""
+    path = _cache_file('info', symbol)
+    info = _read_cache(path, INFO_CACHE_TTL)
+    
+    if info is None:
+        info = get_ticker(symbol, session).get_info()
+        if info:
+            _write_cache(path, info)
+    
+    return info
+
+# Symbol files only change when edited by hand: parse results are memoized on
+# (path, mtime) so touching the file invalidates the entry
+@lru_cache(maxsize=8)
+def _read_portfolio_symbols(portfolio_file: str, mtime: float) -> Tuple[str, ...]:
+    """Parse cleaned ticker symbols from the broker portfolio export"""
+    if PYARROW_CSV:
+        # pyarrow supports neither nrows nor skiprows here: point header at the column row
+        df = pd.read_csv(portfolio_file, sep=';', header=2, usecols=['Simbolo'],
+                         engine='pyarrow', dtype='string').head(20)
+    else:
+        df = pd.read_csv(portfolio_file, sep=';', skiprows=2, nrows=20, usecols=['Simbolo'], dtype='string')
+    
+    simbolo = df['Simbolo']
+    simbolo = simbolo[simbolo.notna() & (simbolo != 'Totale')]
+    return tuple(clean_portfolio_symbols(simbolo).tolist())
+
+@lru_cache(maxsize=8)
+def _read_universe_symbols(universe_file: str, mtime: float) -> Tuple[str, ...]:
+    """Parse the ticker column of the stock universe file"""
+    df = pd.read_csv(universe_file, sep=';', usecols=['Ticker'])
+    return tuple(df['Ticker'].tolist())
+
 class MarketDataCollector:
     """Comprehensive market data collection with rate limiting and error handling"""
     
@@ -20,50 +381,54 @@ class MarketDataCollector:
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(log_level)
         
-        # Rate limiting parameters
-        self.request_delay = 0.5  # Seconds between requests
-        self.batch_delay = 2.0    # Seconds between batches
-        self.batch_size = 5       # Symbols per batch
+        # Session for yfinance calls: None (yfinance keeps its own) unless curl_cffi is missing
+        self.session = get_yfinance_session()
+        
+        # Rate limiting parameters (only the requests fallback session retries 429s itself)
+        self.request_delay = 0.5 if self.session is None else 0.0  # Seconds between requests
+        self.max_workers = 10     # Concurrent symbol fetches (I/O bound, so threads are fine)
         
         # Data periods
         self.historical_period = "2y"  # 2 years as requested
         self.trading_days_year = 252   # For annualization
+        
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="yf")
     
     def parse_european_number(self, value_str):
         """Parse European number format (1.234,56 -> 1234.56)"""
         if pd.isna(value_str) or value_str == '' or str(value_str).strip() == '':
             return 0.0
         
-        value_str = str(value_str).strip()
+        value_str = str(value_str)
+        m = _EURO_RE.match(value_str)
+        if m is not None:
+            sign, euro_int, euro_dec, us_int, us_dec = m.groups()
+            if euro_int is None:
+                return float(sign + us_int + ('.' + us_dec if us_dec else ''))
+            digits = euro_int.replace('.', '') + '.' + euro_dec
+            return float(sign + digits) if digits != '.' else 0.0
+        
+        # Anything the pattern does not cover (exponents, several commas, ...)
+        value_str = value_str.strip()
         
         if ',' in value_str and '.' in value_str:
             # European format: 1.234,56
             parts = value_str.split(',')
             if len(parts) == 2:
-                integer_part = parts[0].replace('.', '')
-                decimal_part = parts[1]
-                value_str = integer_part + '.' + decimal_part
+                value_str = parts[0].replace('.', '') + '.' + parts[1]
         elif ',' in value_str:
             # Only comma, assume it's decimal separator
             value_str = value_str.replace(',', '.')
-            
+        
         try:
             return float(value_str)
         except ValueError:
             return 0.0
     
     def load_portfolio_symbols(self, portfolio_file="actual-portfolio-master.csv"):
-        """Load symbols from portfolio file"""
+        """Load symbols from portfolio file (re-parsed only when the file changes)"""
         try:
-            df = pd.read_csv(portfolio_file, sep=';', skiprows=2, nrows=20)
-            symbols = []
-            
-            for _, row in df.iterrows():
-                if pd.notna(row['Simbolo']) and row['Simbolo'] != 'Totale':
-                    symbol = row['Simbolo'].split('.')[0]  # Remove exchange suffix
-                    if symbol.startswith('1'):  # Remove '1' prefix from European symbols
-                        symbol = symbol[1:]
-                    symbols.append(symbol)
+            symbols = list(_read_portfolio_symbols(portfolio_file, os.path.getmtime(portfolio_file)))
             
             self.logger.info(f"📊 Loaded {len(symbols)} portfolio symbols")
             return symbols
@@ -73,10 +438,9 @@ class MarketDataCollector:
             return []
     
     def load_universe_symbols(self, universe_file="master name ticker.csv"):
-        """Load symbols from stock universe file"""
+        """Load symbols from stock universe file (re-parsed only when the file changes)"""
         try:
-            df = pd.read_csv(universe_file, sep=';')
-            symbols = df['Ticker'].tolist()
+            symbols = list(_read_universe_symbols(universe_file, os.path.getmtime(universe_file)))
             
             self.logger.info(f"📊 Loaded {len(symbols)} universe symbols")
             return symbols
@@ -85,19 +449,21 @@ class MarketDataCollector:
             self.logger.error(f"❌ Failed to load universe symbols: {e}")
             return []
     
-    def fetch_single_stock_data(self, symbol: str) -> Dict:
+    def fetch_single_stock_data(self, symbol: str, hist: Optional[pd.DataFrame] = None) -> Dict:
         """
         Fetch comprehensive data for a single stock
         
         Args:
             symbol: Stock ticker symbol
+            hist: Already downloaded price history (fetched here when None)
             
         Returns:
             Dict with historical prices, analyst data, and calculated metrics
         """
         data = {
             'symbol': symbol,
-            'prices': None,
+            'close': None,
+            'dates': None,
             'current_price': None,
             'returns': None,
             'volatility': None,
@@ -109,30 +475,38 @@ class MarketDataCollector:
         try:
             self.logger.info(f"📈 Fetching data for {symbol}")
             
-            # Create ticker object
-            ticker = yf.Ticker(symbol)
-            
-            # Fetch historical data (2 years)
-            hist = ticker.history(period=self.historical_period)
+            # Fetch historical data (2 years), served from the daily disk cache when possible
+            if hist is None:
+                hist = cached_history(symbol, self.historical_period, session=self.session)
             
-            if hist.empty:
+            if hist.empty or hist['Close'].count() == 0:
                 self.logger.warning(f"⚠️ No historical data for {symbol}")
                 return data
             
-            # Store price data
-            data['prices'] = hist
-            data['current_price'] = hist['Close'].iloc[-1]
+            # Store only the close prices (plus their dates) rather than the full OHLCV frame;
+            # the current price is the last actual close, skipping empty trailing bars
+            close = hist['Close'].dropna()
+            data['close'] = close.to_numpy(dtype=np.float64)
+            data['dates'] = close.index
+            data['current_price'] = float(data['close'][-1])
             
             # Calculate returns
-            returns = hist['Close'].pct_change().dropna()
+            returns = simple_returns(close)
             data['returns'] = returns
             
             # Calculate annualized volatility
-            data['volatility'] = returns.std() * np.sqrt(self.trading_days_year)
+            returns_arr = returns.to_numpy()
+            data['volatility'] = (
+                float(returns_arr.std(ddof=1) * np.sqrt(self.trading_days_year)) if returns_arr.size > 1 else np.nan
+            )
             
             # Fetch analyst targets and info
             try:
-                info = ticker.info
+                info = cached_info(symbol, session=self.session)
+                
+                # Keep only the fields used downstream instead of the whole (multi-MB) info payload;
+                # absent keys stay absent so readers' .get() defaults and 'in' checks still apply
+                info = {key: info[key] for key in _INFO_KEYS if key in info}
                 data['info'] = info
                 
                 # Extract analyst targets
@@ -153,8 +527,9 @@ class MarketDataCollector:
             data['success'] = True
             self.logger.info(f"✅ Successfully fetched {symbol}: ${data['current_price']:.2f}")
             
-            # Rate limiting
-            time.sleep(self.request_delay)
+            # Pacing floor between requests (0 when the fallback session's Retry backs off on 429s)
+            if self.request_delay > 0:
+                time.sleep(self.request_delay)
             
         except Exception as e:
             self.logger.error(f"❌ Failed to fetch {symbol}: {e}")
@@ -163,35 +538,106 @@ class MarketDataCollector:
     
     def fetch_batch_data(self, symbols: List[str]) -> Dict[str, Dict]:
         """
-        Fetch data for a batch of symbols with rate limiting
+        Fetch data for a batch of symbols concurrently
+        
+        Price histories come from one multi-ticker download, analyst info requests
+        run on the collector's thread pool.
         
         Args:
             symbols: List of ticker symbols
             
         Returns:
-            Dict mapping symbols to their data
+            Dict mapping symbols to their data (in input order)
         """
-        batch_data = {}
+        self.logger.info(f"📦 Fetching {len(symbols)} symbols with {self.max_workers} workers")
         
-        # Process in batches
-        for i in range(0, len(symbols), self.batch_size):
-            batch = symbols[i:i + self.batch_size]
-            
-            self.logger.info(f"📦 Processing batch {i//self.batch_size + 1}: {batch}")
-            
-            for symbol in batch:
-                batch_data[symbol] = self.fetch_single_stock_data(symbol)
-            
-            # Batch delay
-            if i + self.batch_size < len(symbols):
-                self.logger.info(f"⏳ Batch delay: {self.batch_delay}s")
-                time.sleep(self.batch_delay)
+        # Histories in one multi-ticker download; on failure each worker fetches its own
+        try:
+            histories = download_histories(symbols, self.historical_period, session=self.session)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Bulk history download failed, fetching per symbol: {e}")
+            histories = {}
+        
+        # Analyst info is still per symbol, so that part stays on the thread pool
+        futures = {
+            self.executor.submit(self.fetch_single_stock_data, symbol, histories.get(symbol)): symbol
+            for symbol in symbols
+        }
+        results = {}
+        
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+        
+        batch_data = {symbol: results[symbol] for symbol in symbols}
         
         successful = sum(1 for data in batch_data.values() if data['success'])
         self.logger.info(f"✅ Successfully fetched {successful}/{len(symbols)} symbols")
         
         return batch_data
     
+    async def _fetch_chart(self, client, symbol: str) -> Dict:
+        """Fetch daily closes for one symbol straight from Yahoo's chart endpoint"""
+        response = await client.get(YAHOO_CHART_URL.format(symbol=symbol),
+                                    params={'range': self.historical_period, 'interval': '1d'})
+        response.raise_for_status()
+        
+        result = response.json()['chart']['result'][0]
+        closes = np.array(result['indicators']['quote'][0]['close'], dtype=np.float64)  # None -> NaN
+        timestamps = pd.to_datetime(np.asarray(result['timestamp'], dtype=np.int64), unit='s', utc=True)
+        
+        valid = np.isfinite(closes)
+        return {'symbol': symbol, 'close': closes[valid], 'dates': timestamps[valid]}
+    
+    async def fetch_universe_async(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch close-price histories for a large universe concurrently
+        
+        Uses one httpx.AsyncClient (HTTP/2 when available) and asyncio.gather instead
+        of a thread per request. Falls back to download_histories when httpx is not
+        installed. Run with asyncio.run(collector.fetch_universe_async(symbols)).
+        
+        Args:
+            symbols: List of stock symbols
+            
+        Returns:
+            Dict of {symbol: {'symbol', 'close', 'dates', 'success'}}
+        """
+        self.logger.info(f"🌍 Fetching universe of {len(symbols)} symbols")
+        
+        if not HTTPX_AVAILABLE:
+            self.logger.warning("⚠️ httpx not installed, falling back to yf.download")
+            try:
+                histories = await asyncio.to_thread(download_histories, symbols, self.historical_period, self.session)
+            except Exception as e:
+                self.logger.error(f"❌ Universe download failed: {e}")
+                histories = {}
+            universe = {}
+            for symbol in symbols:
+                close = histories.get(symbol, pd.DataFrame()).get('Close', pd.Series(dtype=np.float64)).dropna()
+                universe[symbol] = {'symbol': symbol, 'close': close.to_numpy(dtype=np.float64),
+                                    'dates': close.index, 'success': not close.empty}
+            return universe
+        
+        limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        async with httpx.AsyncClient(limits=limits, http2=HTTP2_AVAILABLE, timeout=30,
+                                     headers={'User-Agent': USER_AGENT}) as client:
+            results = await asyncio.gather(*[self._fetch_chart(client, symbol) for symbol in symbols],
+                                           return_exceptions=True)
+        
+        universe = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"⚠️ Failed to fetch {symbol}: {result}")
+                universe[symbol] = {'symbol': symbol, 'close': None, 'dates': None, 'success': False}
+            else:
+                result['success'] = result['close'].size > 0
+                universe[symbol] = result
+        
+        successful = sum(1 for data in universe.values() if data['success'])
+        self.logger.info(f"✅ Universe fetch complete: {successful}/{len(symbols)} successful")
+        
+        return universe
+    
     def calculate_returns_matrix(self, market_data: Dict[str, Dict]) -> pd.DataFrame:
         """
         Calculate aligned returns matrix for portfolio optimization
@@ -212,10 +658,17 @@ class MarketDataCollector:
             self.logger.error("❌ No valid returns data")
             return pd.DataFrame()
         
-        # Align all return series
-        returns_df = pd.DataFrame(returns_data)
+        # Align all return series on the trading days they share (what the old
+        # outer join + dropna() kept) and stack the columns as plain ndarrays,
+        # so no N-way index alignment happens inside the DataFrame constructor
+        symbols = list(returns_data)
+        common_idx = reduce(lambda a, b: a.intersection(b), (s.index for s in returns_data.values()))
         
-        # Drop rows with any NaN values for clean covariance calculation
+        matrix = np.column_stack([returns_data[symbol].reindex(common_idx).to_numpy(dtype=np.float64)
+                                  for symbol in symbols])
+        returns_df = pd.DataFrame(matrix, index=common_idx, columns=symbols)
+        
+        # Guard against NaNs inside individual series (no-op for cleaned returns)
         returns_df = returns_df.dropna()
         
         self.logger.info(f"📊 Returns matrix: {returns_df.shape[0]} days, {returns_df.shape[1]} stocks")
@@ -242,34 +695,19 @@ class MarketDataCollector:
         # Method 1: Geometric mean (more accurate for compound returns)
         # Convert returns to price relatives, take geometric mean, annualize
         try:
-            n_days = len(returns_df)
-            
-            # Calculate compound returns: (1+r1)*(1+r2)*...*(1+rn)^(252/n) - 1
-            price_relatives = 1 + returns_df
-            geometric_means = price_relatives.prod() ** (self.trading_days_year / n_days) - 1
+            geometric_means, arithmetic_means = self._annualized_means(returns_df.to_numpy(dtype=np.float64))
             
-            # For numerical stability, also calculate arithmetic mean as backup
-            arithmetic_means = returns_df.mean() * self.trading_days_year
-            
-            # Log both methods for comparison
+            # Log both methods for comparison (sample detail only when debugging)
             self.logger.info(f"📈 Expected returns calculated for {len(geometric_means)} stocks")
-            self.logger.info(f"📊 Method comparison for sample stocks:")
             
-            for symbol in geometric_means.head(3).index:
-                geo = geometric_means[symbol]
-                arith = arithmetic_means[symbol]
-                self.logger.info(f"   {symbol}: Geometric={geo:.4f} ({geo:.2%}), Arithmetic={arith:.4f} ({arith:.2%})")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(f"📊 Method comparison for sample stocks:")
+                for symbol, geo, arith in zip(returns_df.columns[:3], geometric_means, arithmetic_means):
+                    self.logger.debug(f"   {symbol}: Geometric={geo:.4f} ({geo:.2%}), Arithmetic={arith:.4f} ({arith:.2%})")
             
             # Use geometric mean as primary method
-            annual_returns = geometric_means
-            
-            # Handle any invalid values (replace with arithmetic mean)
-            invalid_mask = ~np.isfinite(annual_returns) | (annual_returns < -0.95) | (annual_returns > 5.0)
-            if invalid_mask.any():
-                self.logger.warning(f"⚠️ Replacing {invalid_mask.sum()} invalid geometric returns with arithmetic mean")
-                annual_returns[invalid_mask] = arithmetic_means[invalid_mask]
-            
-            return annual_returns
+            annual_returns = self._replace_invalid_returns(geometric_means, arithmetic_means)
+            return pd.Series(annual_returns, index=returns_df.columns)
             
         except Exception as e:
             self.logger.error(f"❌ Geometric mean calculation failed: {e}")
@@ -282,6 +720,46 @@ class MarketDataCollector:
             self.logger.info(f"📈 Expected returns (arithmetic) calculated for {len(annual_returns)} stocks")
             return annual_returns
     
+    def calculate_expected_returns_array(self, returns_df: pd.DataFrame) -> Tuple[np.ndarray, List[str]]:
+        """
+        Same estimate as calculate_expected_returns, as a plain ndarray
+        
+        For optimizers that only need values aligned with the symbol list, this
+        skips the Series construction and the per-stock logging.
+        
+        Returns:
+            Tuple of (annualized expected returns, symbols)
+        """
+        symbols = list(returns_df.columns)
+        if returns_df.empty:
+            return np.empty(0, dtype=np.float64), symbols
+        
+        geometric_means, arithmetic_means = self._annualized_means(returns_df.to_numpy(dtype=np.float64))
+        return self._replace_invalid_returns(geometric_means, arithmetic_means), symbols
+    
+    def _annualized_means(self, mat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Annualized geometric and arithmetic means of a (days x stocks) returns matrix"""
+        # Calculate compound returns: (1+r1)*(1+r2)*...*(1+rn)^(252/n) - 1
+        geometric_means = np.prod(1.0 + mat, axis=0) ** (self.trading_days_year / mat.shape[0]) - 1
+        
+        # For numerical stability, also calculate arithmetic mean as backup
+        arithmetic_means = mat.mean(axis=0) * self.trading_days_year
+        return geometric_means, arithmetic_means
+    
+    def _replace_invalid_returns(self, annual_returns: np.ndarray, fallback: np.ndarray) -> np.ndarray:
+        """Replace non-finite or implausible (< -95% / > 500%) returns with the fallback estimate"""
+        # Build the mask in a single preallocated buffer instead of OR-ing three temporaries
+        invalid_mask = np.empty(annual_returns.shape, dtype=bool)
+        np.isfinite(annual_returns, out=invalid_mask)
+        np.logical_not(invalid_mask, out=invalid_mask)
+        np.logical_or(invalid_mask, annual_returns < -0.95, out=invalid_mask)
+        np.logical_or(invalid_mask, annual_returns > 5.0, out=invalid_mask)
+        if invalid_mask.any():
+            self.logger.warning(f"⚠️ Replacing {invalid_mask.sum()} invalid geometric returns with arithmetic mean")
+            annual_returns = np.where(invalid_mask, fallback, annual_returns)
+        
+        return annual_returns
+    
     def calculate_covariance_matrix(self, returns_df: pd.DataFrame) -> pd.DataFrame:
         """
         Calculate annualized covariance matrix with mathematical validation
@@ -298,28 +776,49 @@ class MarketDataCollector:
         if returns_df.empty:
             return pd.DataFrame()
         
-        # Calculate daily covariance matrix
-        daily_cov = returns_df.cov()
-        
-        # Annualize covariance matrix
-        annual_cov = daily_cov * self.trading_days_year
+        # Calculate the annualized covariance matrix with a single np.cov over the
+        # NaN-free, C-contiguous returns matrix (skips DataFrame.cov's pairwise NaN handling)
+        mat = np.ascontiguousarray(returns_df.to_numpy(dtype=np.float64))
+        cov_values = np.cov(mat, rowvar=False, ddof=1) * self.trading_days_year
+        annual_cov = pd.DataFrame(cov_values, index=returns_df.columns, columns=returns_df.columns)
         
         # Mathematical validation
         n_assets = annual_cov.shape[0]
         
-        # Check matrix properties
-        is_symmetric = np.allclose(annual_cov, annual_cov.T, atol=1e-10)
-        eigenvals = np.linalg.eigvals(annual_cov.values)
-        is_positive_semidefinite = np.all(eigenvals >= -1e-8)  # Allow small numerical errors
-        min_eigenval = np.min(eigenvals)
-        condition_number = np.max(eigenvals) / np.max([np.min(eigenvals[eigenvals > 1e-10]), 1e-10])
+        # Fast path: Cholesky succeeds iff the matrix is positive definite, which is the common case.
+        # Only fall back to a full (symmetric) eigendecomposition when it fails.
+        eigenvals = None
+        try:
+            np.linalg.cholesky(cov_values)
+            is_positive_semidefinite = True
+            min_eigenval = None
+        except np.linalg.LinAlgError:
+            eigenvals = np.linalg.eigvalsh(cov_values)
+            min_eigenval = eigenvals.min()
+            is_positive_semidefinite = min_eigenval >= -1e-8  # Allow small numerical errors
         
         self.logger.info(f"🔢 Covariance matrix calculated: {annual_cov.shape}")
-        self.logger.info(f"📊 Matrix validation:")
-        self.logger.info(f"   Symmetric: {is_symmetric}")
-        self.logger.info(f"   Positive semi-definite: {is_positive_semidefinite}")
-        self.logger.info(f"   Min eigenvalue: {min_eigenval:.6f}")
-        self.logger.info(f"   Condition number: {condition_number:.2f}")
+        
+        # Detailed validation report (the condition number needs the full spectrum,
+        # so only pay for it when debugging)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            # Symmetry only needs the strict upper triangle vs. its mirror
+            upper = np.triu_indices(n_assets, k=1)
+            is_symmetric = np.allclose(cov_values[upper], cov_values.T[upper], atol=1e-10)
+            
+            self.logger.debug(f"📊 Matrix validation:")
+            self.logger.debug(f"   Symmetric: {is_symmetric}")
+            self.logger.debug(f"   Positive semi-definite: {is_positive_semidefinite}")
+            if min_eigenval is not None:
+                self.logger.debug(f"   Min eigenvalue: {min_eigenval:.6f}")
+            
+            if eigenvals is None:
+                eigenvals = np.linalg.eigvalsh(cov_values)
+            condition_number = np.max(eigenvals) / np.max([np.min(eigenvals[eigenvals > 1e-10]), 1e-10])
+            self.logger.debug(f"   Condition number: {condition_number:.2f}")
+            
+            if condition_number > 1e12:
+                self.logger.warning(f"⚠️ High condition number ({condition_number:.2e}), matrix may be ill-conditioned")
         
         # Handle numerical issues
         if not is_positive_semidefinite:
@@ -328,18 +827,14 @@ class MarketDataCollector:
             regularization = max(-min_eigenval * 1.1, 1e-6)
             annual_cov += np.eye(n_assets) * regularization
             self.logger.info(f"✅ Added regularization: {regularization:.6f}")
-        
-        if condition_number > 1e12:
-            self.logger.warning(f"⚠️ High condition number ({condition_number:.2e}), matrix may be ill-conditioned")
-        
-        # Verify final matrix properties
-        final_eigenvals = np.linalg.eigvals(annual_cov.values)
-        final_min_eigenval = np.min(final_eigenvals)
-        
-        if final_min_eigenval < 0:
-            self.logger.error(f"❌ Final matrix still not positive semi-definite: min eigenval = {final_min_eigenval:.6f}")
-        else:
-            self.logger.info(f"✅ Final matrix is positive semi-definite: min eigenval = {final_min_eigenval:.6f}")
+            
+            # Verify final matrix properties
+            final_min_eigenval = np.linalg.eigvalsh(annual_cov.values).min()
+            
+            if final_min_eigenval < 0:
+                self.logger.error(f"❌ Final matrix still not positive semi-definite: min eigenval = {final_min_eigenval:.6f}")
+            else:
+                self.logger.info(f"✅ Final matrix is positive semi-definite: min eigenval = {final_min_eigenval:.6f}")
         
         return annual_cov
     
@@ -353,31 +848,33 @@ class MarketDataCollector:
         Returns:
             DataFrame with analyst targets
         """
-        targets_data = []
+        symbols, prices, lows, means, highs, recommendations, volatilities = [], [], [], [], [], [], []
         
         for symbol, data in market_data.items():
             if data['success']:
-                target_info = {
-                    'symbol': symbol,
-                    'current_price': data['current_price'],
-                    'low_target': data['analyst_targets'].get('low'),
-                    'mean_target': data['analyst_targets'].get('mean'),
-                    'high_target': data['analyst_targets'].get('high'),
-                    'recommendation': data['analyst_targets'].get('recommendation'),
-                    'volatility': data['volatility']
-                }
-                
-                # Calculate upside potential using low target (conservative approach)
-                if target_info['low_target'] and target_info['current_price']:
-                    target_info['upside_potential'] = (
-                        target_info['low_target'] - target_info['current_price']
-                    ) / target_info['current_price']
-                else:
-                    target_info['upside_potential'] = None
-                
-                targets_data.append(target_info)
-        
-        targets_df = pd.DataFrame(targets_data)
+                targets = data['analyst_targets']
+                symbols.append(symbol)
+                prices.append(data['current_price'])
+                lows.append(targets.get('low'))
+                means.append(targets.get('mean'))
+                highs.append(targets.get('high'))
+                recommendations.append(targets.get('recommendation'))
+                volatilities.append(data['volatility'])
+        
+        targets_df = pd.DataFrame({
+            'symbol': symbols,
+            'current_price': pd.Series(prices, dtype='float64'),
+            'low_target': pd.Series(lows, dtype='float64'),
+            'mean_target': pd.Series(means, dtype='float64'),
+            'high_target': pd.Series(highs, dtype='float64'),
+            'recommendation': recommendations,
+            'volatility': pd.Series(volatilities, dtype='float64')
+        })
+        
+        # Calculate upside potential using low target (conservative approach)
+        targets_df['upside_potential'] = (
+            targets_df['low_target'] - targets_df['current_price']
+        ) / targets_df['current_price']
         
         # Filter stocks with analyst targets (as requested)
         targets_with_data = targets_df[targets_df['low_target'].notna()]
@@ -4,6 +4,10 @@ Tigro Portfolio Optimization System
 Advanced portfolio analysis with sentiment integration
 """
 
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 import numpy as np
 import yfinance as yf
@@ -11,10 +15,15 @@ import warnings
 warnings.filterwarnings('ignore')
 
 from datetime import datetime, timedelta
+from functools import reduce
 from scipy.optimize import minimize
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from financial.fin_market_data import (get_yfinance_session, portfolio_frame, cached_history,
+                                      cached_info, download_histories, simple_returns,
+                                      annualized_return_stats)
+
 class PortfolioAnalyzer:
     """Advanced portfolio analysis with Modern Portfolio Theory"""
     
@@ -24,50 +33,20 @@ class PortfolioAnalyzer:
         self.universe_data = None
         self.price_data = None
         
+        # Same yfinance session as MarketDataCollector (None: yfinance keeps its own)
+        self.session = get_yfinance_session()
+        
     def load_portfolio(self, portfolio_file):
         """Load current portfolio from CSV"""
         print("📊 Loading current portfolio...")
         df = pd.read_csv(portfolio_file, sep=';', skiprows=2, nrows=14)
+        self.current_portfolio = portfolio_frame(df, {
+            'quantity': 'Quantità',
+            'avg_cost': 'P.zo medio di carico',
+            'current_value_eur': 'Valore di mercato €',
+            'return_pct': 'Var%'
+        }).reset_index(drop=True)
         
-        # Clean and extract relevant columns
-        portfolio_data = []
-        for _, row in df.iterrows():
-            if pd.notna(row['Simbolo']) and row['Simbolo'] != 'Totale':
-                # Clean symbol (remove exchange suffix)
-                symbol = row['Simbolo'].split('.')[0]
-                if symbol.startswith('1'):  # European listing prefix
-                    symbol = symbol[1:]
-                
-                # Helper function to parse European number format
-                def parse_european_number(value_str):
-                    """Parse European number format (1.234,56 -> 1234.56)"""
-                    value_str = str(value_str).strip()
-                    if value_str == 'nan' or value_str == '':
-                        return 0.0
-                    # Replace thousands separator (.) with nothing, then decimal separator (,) with .
-                    # But first check if it's already in US format
-                    if ',' in value_str and '.' in value_str:
-                        # European format: 1.234,56
-                        parts = value_str.split(',')
-                        if len(parts) == 2:
-                            integer_part = parts[0].replace('.', '')
-                            decimal_part = parts[1]
-                            value_str = integer_part + '.' + decimal_part
-                    elif ',' in value_str:
-                        # Only comma, assume it's decimal separator
-                        value_str = value_str.replace(',', '.')
-                    return float(value_str)
-                
-                portfolio_data.append({
-                    'symbol': symbol,
-                    'name': row['Titolo'],
-                    'quantity': parse_european_number(row['Quantità']),
-                    'avg_cost': parse_european_number(row['P.zo medio di carico']),
-                    'current_value_eur': parse_european_number(row['Valore di mercato €']),
-                    'return_pct': parse_european_number(row['Var%'])
-                })
-        
-        self.current_portfolio = pd.DataFrame(portfolio_data)
         print(f"✅ Loaded {len(self.current_portfolio)} positions")
         return self.current_portfolio
     
@@ -85,16 +64,24 @@ class PortfolioAnalyzer:
         data = {}
         failed_symbols = []
         
+        # All histories in one multi-ticker request; fall back to per-symbol fetches on failure
+        try:
+            histories = download_histories(symbols, period, session=self.session)
+        except Exception as e:
+            print(f"⚠️ Bulk download failed, fetching per symbol: {str(e)}")
+            histories = {}
+        
         for symbol in symbols:
             try:
-                ticker = yf.Ticker(symbol)
-                hist = ticker.history(period=period)
-                info = ticker.info
+                hist = histories.get(symbol)
+                if hist is None:
+                    hist = cached_history(symbol, period, session=self.session)
+                info = cached_info(symbol, session=self.session)
                 
                 if not hist.empty:
                     data[symbol] = {
                         'price_data': hist,
-                        'current_price': hist['Close'].iloc[-1],
+                        'current_price': float(hist['Close'].dropna().iloc[-1]),  # Last actual close
                         'info': info
                     }
                 else:
@@ -118,16 +105,17 @@ class PortfolioAnalyzer:
         returns_data = {}
         for symbol in portfolio_symbols:
             if symbol in price_data:
-                prices = price_data[symbol]['price_data']['Close']
-                returns = prices.pct_change().dropna()
-                returns_data[symbol] = returns
+                returns_data[symbol] = simple_returns(price_data[symbol]['price_data']['Close'])
         
         if not returns_data:
             print("❌ No valid return data found")
             return None
         
-        # Create returns matrix
-        returns_df = pd.DataFrame(returns_data).dropna()
+        # Create returns matrix on the trading days all symbols share, so the
+        # DataFrame is assembled from aligned arrays rather than an outer join + dropna()
+        common_idx = reduce(lambda a, b: a.intersection(b), (s.index for s in returns_data.values()))
+        returns_df = pd.DataFrame({symbol: returns.reindex(common_idx).to_numpy()
+                                   for symbol, returns in returns_data.items()}, index=common_idx)
         
         # Calculate metrics
         mean_returns = returns_df.mean() * 252  # Annualized
@@ -135,10 +123,14 @@ class PortfolioAnalyzer:
         correlation_matrix = returns_df.corr()
         
         # Portfolio-level calculations (equal weighted for now)
-        portfolio_weights = np.array([1/len(returns_df.columns)] * len(returns_df.columns))
+        n_assets = len(returns_df.columns)
+        portfolio_weights = np.full(n_assets, 1.0 / n_assets)
         
         portfolio_return = np.sum(mean_returns * portfolio_weights)
-        portfolio_variance = np.dot(portfolio_weights.T, np.dot(returns_df.cov() * 252, portfolio_weights))
+        
+        # Annualized covariance computed once; with equal weights w'Σw collapses to sum(Σ) / n²
+        cov_matrix = np.cov(returns_df.to_numpy(dtype=np.float64), rowvar=False) * 252
+        portfolio_variance = float(cov_matrix.sum()) / n_assets**2
         portfolio_volatility = np.sqrt(portfolio_variance)
         
         sharpe_ratio = (portfolio_return - self.risk_free_rate) / portfolio_volatility
@@ -163,45 +155,49 @@ class PortfolioAnalyzer:
         """Analyze investment universe for opportunities"""
         print("🔍 Analyzing universe opportunities...")
         
-        opportunities = []
+        # Return statistics for every candidate in one stacked kernel call (float32
+        # storage is plenty for screening and halves the matrix at universe scale)
+        candidates = [symbol for symbol in universe_symbols if symbol in price_data]
+        close_arrays = [price_data[symbol]['price_data']['Close'].dropna().to_numpy(dtype=np.float64)
+                        for symbol in candidates]
+        annual_returns, annual_vols, n_returns = annualized_return_stats(close_arrays, 252, dtype=np.float32)
         
-        for symbol in universe_symbols:
-            if symbol in price_data:
+        # Preallocate one slot per candidate symbol; only the first n_found are filled
+        opportunities = [None] * len(candidates)
+        n_found = 0
+        
+        for i, symbol in enumerate(candidates):
+            if n_returns[i] > 50:  # Need sufficient data
                 info = price_data[symbol]['info']
-                price_data_symbol = price_data[symbol]['price_data']
+                annual_return = annual_returns[i]
+                annual_vol = annual_vols[i]
+                sharpe = (annual_return - self.risk_free_rate) / annual_vol if annual_vol > 0 else 0
                 
-                # Calculate basic metrics
-                returns = price_data_symbol['Close'].pct_change().dropna()
+                # Extract analyst data
+                target_price = info.get('targetMeanPrice', None)
+                recommendation = info.get('recommendationMean', None)
+                current_price = price_data[symbol]['current_price']
                 
-                if len(returns) > 50:  # Need sufficient data
-                    annual_return = returns.mean() * 252
-                    annual_vol = returns.std() * np.sqrt(252)
-                    sharpe = (annual_return - self.risk_free_rate) / annual_vol if annual_vol > 0 else 0
-                    
-                    # Extract analyst data
-                    target_price = info.get('targetMeanPrice', None)
-                    recommendation = info.get('recommendationMean', None)
-                    current_price = price_data[symbol]['current_price']
-                    
-                    upside_potential = 0
-                    if target_price and current_price:
-                        upside_potential = (target_price - current_price) / current_price
-                    
-                    opportunities.append({
-                        'symbol': symbol,
-                        'current_price': current_price,
-                        'target_price': target_price,
-                        'upside_potential': upside_potential,
-                        'recommendation_mean': recommendation,
-                        'annual_return': annual_return,
-                        'annual_volatility': annual_vol,
-                        'sharpe_ratio': sharpe,
-                        'market_cap': info.get('marketCap', None),
-                        'sector': info.get('sector', 'Unknown'),
-                        'industry': info.get('industry', 'Unknown')
-                    })
+                upside_potential = 0
+                if target_price and current_price:
+                    upside_potential = (target_price - current_price) / current_price
+                
+                opportunities[n_found] = {
+                    'symbol': symbol,
+                    'current_price': current_price,
+                    'target_price': target_price,
+                    'upside_potential': upside_potential,
+                    'recommendation_mean': recommendation,
+                    'annual_return': annual_return,
+                    'annual_volatility': annual_vol,
+                    'sharpe_ratio': sharpe,
+                    'market_cap': info.get('marketCap', None),
+                    'sector': info.get('sector', 'Unknown'),
+                    'industry': info.get('industry', 'Unknown')
+                }
+                n_found += 1
         
-        opportunities_df = pd.DataFrame(opportunities)
+        opportunities_df = pd.DataFrame(opportunities[:n_found])
         print(f"✅ Analyzed {len(opportunities_df)} opportunities")
         
         return opportunities_df
@@ -210,17 +206,21 @@ class PortfolioAnalyzer:
         """Generate comprehensive portfolio analysis report"""
         print("📋 Generating portfolio report...")
         
+        # Position values and their total are computed once and reused below
+        position_values = current_portfolio.set_index('symbol')['current_value_eur']
+        total_value = position_values.sum()
+        
         report = {
             'timestamp': datetime.now(),
             'current_portfolio_summary': {
                 'total_positions': len(current_portfolio),
-                'total_value_eur': current_portfolio['current_value_eur'].sum(),
+                'total_value_eur': total_value,
                 'portfolio_return': portfolio_metrics['portfolio_return'],
                 'portfolio_volatility': portfolio_metrics['portfolio_volatility'],
                 'sharpe_ratio': portfolio_metrics['sharpe_ratio']
             },
-            'top_opportunities': opportunities_df.nlargest(10, 'sharpe_ratio')[['symbol', 'upside_potential', 'sharpe_ratio', 'sector']],
-            'portfolio_concentration': current_portfolio.set_index('symbol')['current_value_eur'] / current_portfolio['current_value_eur'].sum(),
+            'top_opportunities': opportunities_df[['symbol', 'upside_potential', 'sharpe_ratio', 'sector']].nlargest(10, 'sharpe_ratio'),
+            'portfolio_concentration': position_values / total_value,
             'recommendations': {
                 'high_conviction_buys': [],
                 'position_increases': [],
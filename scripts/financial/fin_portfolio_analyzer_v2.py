@@ -4,6 +4,10 @@ Tigro Portfolio Optimization System V2
 Advanced portfolio analysis with sentiment integration and rate limiting
 """
 
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 import numpy as np
 import yfinance as yf
@@ -12,10 +16,46 @@ import time
 warnings.filterwarnings('ignore')
 
 from datetime import datetime, timedelta
+from functools import reduce, lru_cache
+from typing import Tuple
 from scipy.optimize import minimize
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from financial.fin_market_data import (get_yfinance_session, portfolio_frame, cached_history,
+                                      download_histories, annualized_return_stats, simple_returns,
+                                      top_k_weight)
+
+# Parquet output needs pyarrow; WRITE_CSV_OUTPUT keeps the legacy CSV next to it
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+WRITE_CSV_OUTPUT = False
+
+# Projection horizons in years (3/6/9/12 months)
+DEFAULT_HORIZONS = (0.25, 0.5, 0.75, 1.0)
+
+def _horizon_label(years: float) -> str:
+    """'3_month' style label for whole-month horizons, trading days otherwise"""
+    months = years * 12
+    if abs(months - round(months)) < 1e-9:
+        return f"{int(round(months))}_month"
+    return f"{int(round(years * 252))}_day"
+
+@lru_cache(maxsize=64)
+def _projections_core(current_return: float, current_vol: float, horizons: Tuple[float, ...],
+                      z: float) -> Tuple[Tuple[float, float, float, float], ...]:
+    """(expected, volatility, lower, upper) per horizon, evaluated for all horizons at once"""
+    years = np.asarray(horizons, dtype=np.float64)
+    expected = current_return * years
+    volatility = current_vol * np.sqrt(years)
+    lower = expected - z * volatility
+    upper = expected + z * volatility
+    return tuple(zip(expected.tolist(), volatility.tolist(), lower.tolist(), upper.tolist()))
+
 class PortfolioAnalyzerV2:
     """Advanced portfolio analysis with Modern Portfolio Theory and rate limiting"""
     
@@ -25,48 +65,20 @@ class PortfolioAnalyzerV2:
         self.universe_data = None
         self.price_data = None
         
-    def parse_european_number(self, value_str):
-        """Parse European number format (1.234,56 -> 1234.56)"""
-        value_str = str(value_str).strip()
-        if value_str == 'nan' or value_str == '':
-            return 0.0
-        # Replace thousands separator (.) with nothing, then decimal separator (,) with .
-        if ',' in value_str and '.' in value_str:
-            # European format: 1.234,56
-            parts = value_str.split(',')
-            if len(parts) == 2:
-                integer_part = parts[0].replace('.', '')
-                decimal_part = parts[1]
-                value_str = integer_part + '.' + decimal_part
-        elif ',' in value_str:
-            # Only comma, assume it's decimal separator
-            value_str = value_str.replace(',', '.')
-        return float(value_str)
+        # Same yfinance session as MarketDataCollector (None: yfinance keeps its own)
+        self.session = get_yfinance_session()
         
     def load_portfolio(self, portfolio_file):
         """Load current portfolio from CSV"""
         print("📊 Loading current portfolio...")
         df = pd.read_csv(portfolio_file, sep=';', skiprows=2, nrows=14)
+        self.current_portfolio = portfolio_frame(df, {
+            'quantity': 'Quantità',
+            'avg_cost': 'P.zo medio di carico',
+            'current_value_eur': 'Valore di mercato €',
+            'return_pct': 'Var%'
+        }).reset_index(drop=True)
         
-        # Clean and extract relevant columns
-        portfolio_data = []
-        for _, row in df.iterrows():
-            if pd.notna(row['Simbolo']) and row['Simbolo'] != 'Totale':
-                # Clean symbol (remove exchange suffix)
-                symbol = row['Simbolo'].split('.')[0]
-                if symbol.startswith('1'):  # European listing prefix
-                    symbol = symbol[1:]
-                
-                portfolio_data.append({
-                    'symbol': symbol,
-                    'name': row['Titolo'],
-                    'quantity': self.parse_european_number(row['Quantità']),
-                    'avg_cost': self.parse_european_number(row['P.zo medio di carico']),
-                    'current_value_eur': self.parse_european_number(row['Valore di mercato €']),
-                    'return_pct': self.parse_european_number(row['Var%'])
-                })
-        
-        self.current_portfolio = pd.DataFrame(portfolio_data)
         print(f"✅ Loaded {len(self.current_portfolio)} positions")
         return self.current_portfolio
     
@@ -77,43 +89,55 @@ class PortfolioAnalyzerV2:
         print(f"✅ Loaded {len(self.universe_data)} stocks in universe")
         return self.universe_data
     
-    def fetch_market_data_batch(self, symbols, batch_size=5, delay=2):
-        """Fetch market data in batches with rate limiting"""
+    def fetch_market_data_batch(self, symbols, batch_size=5, delay=0):
+        """Fetch market data in batches (one multi-ticker download per batch)"""
         print(f"📈 Fetching market data for {len(symbols)} symbols in batches...")
         
         data = {}
         failed_symbols = []
         
-        # Process in batches to avoid rate limits
+        # Process in batches (progress is reported per batch)
         for i in range(0, len(symbols), batch_size):
             batch = symbols[i:i + batch_size]
             print(f"  Processing batch {i//batch_size + 1}: {batch}")
             
+            # One multi-ticker request per batch (cached symbols are served from disk)
+            try:
+                histories = download_histories(batch, '6mo', session=self.session)  # Reduced period to be faster
+            except Exception as e:
+                print(f"  ⚠️ Batch download failed, fetching individually: {str(e)[:50]}...")
+                histories = {}
+            
+            # Per-symbol status lines are collected and written once per batch
+            messages = []
             for symbol in batch:
                 try:
-                    time.sleep(0.5)  # Small delay between individual requests
-                    ticker = yf.Ticker(symbol)
-                    hist = ticker.history(period='6mo')  # Reduced period to be faster
+                    hist = histories.get(symbol)
+                    if hist is None:
+                        hist = cached_history(symbol, '6mo', session=self.session)
                     
                     if not hist.empty:
                         # Get basic info without detailed financials to avoid rate limits
-                        current_price = hist['Close'].iloc[-1]
+                        current_price = float(hist['Close'].dropna().iloc[-1])  # Last actual close
                         data[symbol] = {
                             'price_data': hist,
                             'current_price': current_price,
                             'symbol': symbol
                         }
-                        print(f"    ✅ {symbol}: ${current_price:.2f}")
+                        messages.append(f"    ✅ {symbol}: ${current_price:.2f}")
                     else:
                         failed_symbols.append(symbol)
-                        print(f"    ❌ {symbol}: No data")
+                        messages.append(f"    ❌ {symbol}: No data")
                         
                 except Exception as e:
-                    print(f"    ⚠️ {symbol}: {str(e)[:50]}...")
+                    messages.append(f"    ⚠️ {symbol}: {str(e)[:50]}...")
                     failed_symbols.append(symbol)
             
-            # Delay between batches
-            if i + batch_size < len(symbols):
+            if messages:
+                print('\n'.join(messages))
+            
+            # Optional delay between batches
+            if delay > 0 and i + batch_size < len(symbols):
                 print(f"  Waiting {delay}s before next batch...")
                 time.sleep(delay)
         
@@ -127,50 +151,63 @@ class PortfolioAnalyzerV2:
         """Calculate basic portfolio metrics from available data"""
         print("📊 Calculating portfolio metrics...")
         
-        # Map portfolio symbols to market data
-        portfolio_analysis = []
-        total_value = 0
+        # Return statistics for every symbol with market data in one stacked pass
+        symbols_with_data = list(price_data)
+        annual_returns, annual_vols, n_returns = annualized_return_stats(
+            [price_data[symbol]['price_data']['Close'].dropna().to_numpy(dtype=np.float64)
+             for symbol in symbols_with_data], 252)
+        stats_row = {symbol: i for i, symbol in enumerate(symbols_with_data)}
         
-        for _, position in portfolio_data.iterrows():
-            symbol = position['symbol']
-            current_value = position['current_value_eur']
-            total_value += current_value
-            
-            analysis_row = {
-                'symbol': symbol,
-                'name': position['name'],
-                'current_value_eur': current_value,
-                'return_pct': position['return_pct'],
-                'weight': 0  # Will calculate after total_value
-            }
-            
-            # Add market data if available
-            if symbol in price_data:
-                hist = price_data[symbol]['price_data']
-                returns = hist['Close'].pct_change().dropna()
-                
-                if len(returns) > 20:  # Need sufficient data
-                    analysis_row.update({
-                        'daily_volatility': returns.std(),
-                        'annual_volatility': returns.std() * np.sqrt(252),
-                        'annual_return_estimate': returns.mean() * 252,
-                        'current_price': price_data[symbol]['current_price']
-                    })
-            
-            portfolio_analysis.append(analysis_row)
+        # Map portfolio symbols to market data (positions with too little history keep NaN stats)
+        analysis_df = portfolio_data[['symbol', 'name', 'current_value_eur', 'return_pct']].reset_index(drop=True)
+        rows = analysis_df['symbol'].map(stats_row).fillna(-1).astype(int).to_numpy()
+        has_stats = rows >= 0
+        has_stats[has_stats] = n_returns[rows[has_stats]] > 20  # Need sufficient data
         
-        # Calculate weights
-        for row in portfolio_analysis:
-            row['weight'] = row['current_value_eur'] / total_value
+        if has_stats.any():
+            matched = rows[has_stats]
+            daily_volatility = np.full(len(analysis_df), np.nan)
+            annual_volatility = np.full(len(analysis_df), np.nan)
+            annual_return_estimate = np.full(len(analysis_df), np.nan)
+            daily_volatility[has_stats] = annual_vols[matched] / np.sqrt(252)
+            annual_volatility[has_stats] = annual_vols[matched]
+            annual_return_estimate[has_stats] = annual_returns[matched]
+            
+            analysis_df['daily_volatility'] = daily_volatility
+            analysis_df['annual_volatility'] = annual_volatility
+            analysis_df['annual_return_estimate'] = annual_return_estimate
+            analysis_df['current_price'] = analysis_df['symbol'].map(
+                lambda symbol: price_data[symbol]['current_price'] if symbol in price_data else np.nan
+            ).where(has_stats)
         
-        analysis_df = pd.DataFrame(portfolio_analysis)
+        # Calculate weights in one column operation (kept right after return_pct)
+        total_value = analysis_df['current_value_eur'].sum()
+        analysis_df.insert(analysis_df.columns.get_loc('return_pct') + 1, 'weight',
+                           analysis_df['current_value_eur'] / total_value)
         
         # Portfolio-level metrics
-        valid_returns = [row for row in portfolio_analysis if 'annual_return_estimate' in row]
+        concentration_top5 = top_k_weight(analysis_df['weight'], 5)
         
-        if valid_returns:
-            weighted_return = sum(row['annual_return_estimate'] * row['weight'] for row in valid_returns)
-            weighted_volatility = np.sqrt(sum((row['annual_volatility'] * row['weight'])**2 for row in valid_returns))
+        if 'annual_return_estimate' in analysis_df:
+            mask = analysis_df['annual_return_estimate'].notna().to_numpy()
+            w = analysis_df['weight'].to_numpy()[mask]
+            weighted_return = float(w @ analysis_df['annual_return_estimate'].to_numpy()[mask])
+            
+            # Portfolio volatility from the full covariance (w'Σw) over the days all
+            # positions share, so correlations between holdings are accounted for
+            returns_data = [simple_returns(price_data[symbol]['price_data']['Close'])
+                            for symbol in analysis_df['symbol'][mask]]
+            common_idx = reduce(lambda a, b: a.intersection(b), (r.index for r in returns_data))
+            
+            if len(common_idx) > 1:
+                returns_matrix = np.column_stack([r.reindex(common_idx).to_numpy(dtype=np.float64) for r in returns_data])
+                cov_matrix = np.atleast_2d(np.cov(returns_matrix, rowvar=False, ddof=1)) * 252
+                weighted_volatility = float(np.sqrt(w @ cov_matrix @ w))
+            else:
+                # No overlapping history: fall back to the zero-correlation approximation
+                weighted_vols = w * analysis_df['annual_volatility'].to_numpy()[mask]
+                weighted_volatility = float(np.sqrt(weighted_vols @ weighted_vols))
+            
             sharpe_ratio = (weighted_return - self.risk_free_rate) / weighted_volatility if weighted_volatility > 0 else 0
             
             portfolio_metrics = {
@@ -179,7 +216,7 @@ class PortfolioAnalyzerV2:
                 'portfolio_volatility': weighted_volatility,
                 'sharpe_ratio': sharpe_ratio,
                 'num_positions': len(analysis_df),
-                'concentration_top5': analysis_df.nlargest(5, 'weight')['weight'].sum()
+                'concentration_top5': concentration_top5
             }
         else:
             portfolio_metrics = {
@@ -188,13 +225,13 @@ class PortfolioAnalyzerV2:
                 'portfolio_volatility': None,
                 'sharpe_ratio': None,
                 'num_positions': len(analysis_df),
-                'concentration_top5': analysis_df.nlargest(5, 'weight')['weight'].sum()
+                'concentration_top5': concentration_top5
             }
         
         return analysis_df, portfolio_metrics
     
-    def calculate_forward_projections(self, portfolio_metrics, analysis_df):
-        """Calculate forward-looking projections"""
+    def calculate_forward_projections(self, portfolio_metrics, analysis_df, horizons=DEFAULT_HORIZONS, z=1.96):
+        """Calculate forward-looking projections for each horizon (in years) with a z-score confidence band"""
         print("🔮 Calculating forward projections...")
         
         if portfolio_metrics['portfolio_return'] is None:
@@ -204,31 +241,17 @@ class PortfolioAnalyzerV2:
         current_vol = portfolio_metrics['portfolio_volatility']
         
         # Simple projections (can be enhanced with more sophisticated models)
+        horizons = tuple(float(h) for h in horizons)
+        labels = [_horizon_label(h) for h in horizons]
         projections = {
-            '3_month': {
-                'expected_return': current_return * 0.25,
-                'volatility': current_vol * np.sqrt(0.25),
-                'confidence_95_lower': current_return * 0.25 - 1.96 * current_vol * np.sqrt(0.25),
-                'confidence_95_upper': current_return * 0.25 + 1.96 * current_vol * np.sqrt(0.25)
-            },
-            '6_month': {
-                'expected_return': current_return * 0.5,
-                'volatility': current_vol * np.sqrt(0.5),
-                'confidence_95_lower': current_return * 0.5 - 1.96 * current_vol * np.sqrt(0.5),
-                'confidence_95_upper': current_return * 0.5 + 1.96 * current_vol * np.sqrt(0.5)
-            },
-            '9_month': {
-                'expected_return': current_return * 0.75,
-                'volatility': current_vol * np.sqrt(0.75),
-                'confidence_95_lower': current_return * 0.75 - 1.96 * current_vol * np.sqrt(0.75),
-                'confidence_95_upper': current_return * 0.75 + 1.96 * current_vol * np.sqrt(0.75)
-            },
-            '12_month': {
-                'expected_return': current_return,
-                'volatility': current_vol,
-                'confidence_95_lower': current_return - 1.96 * current_vol,
-                'confidence_95_upper': current_return + 1.96 * current_vol
+            label: {
+                'expected_return': expected,
+                'volatility': volatility,
+                'confidence_95_lower': lower,
+                'confidence_95_upper': upper
             }
+            for label, (expected, volatility, lower, upper)
+            in zip(labels, _projections_core(float(current_return), float(current_vol), horizons, float(z)))
         }
         
         return projections
@@ -254,7 +277,7 @@ def main():
     print("PHASE 1: MARKET DATA COLLECTION")
     print("="*50)
     
-    portfolio_market_data, failed_symbols = analyzer.fetch_market_data_batch(portfolio_symbols, batch_size=3, delay=3)
+    portfolio_market_data, failed_symbols = analyzer.fetch_market_data_batch(portfolio_symbols, batch_size=3)
     
     if portfolio_market_data:
         # Calculate portfolio metrics
@@ -288,9 +311,13 @@ def main():
         analysis_display['weight'] = analysis_display['weight'] * 100
         print(analysis_display.round(2).to_string(index=False))
         
-        # Save results
-        analysis_df.to_csv('portfolio_analysis_output.csv', index=False)
-        print(f"\n💾 Analysis saved to 'portfolio_analysis_output.csv'")
+        # Save results (typed columnar parquet when pyarrow is available)
+        if PYARROW_AVAILABLE:
+            analysis_df.to_parquet('portfolio_analysis_output.parquet', compression='zstd', index=False)
+            print(f"\n💾 Analysis saved to 'portfolio_analysis_output.parquet'")
+        if WRITE_CSV_OUTPUT or not PYARROW_AVAILABLE:
+            analysis_df.to_csv('portfolio_analysis_output.csv', index=False)
+            print(f"\n💾 Analysis saved to 'portfolio_analysis_output.csv'")
         
     else:
         print("❌ No market data available for analysis")
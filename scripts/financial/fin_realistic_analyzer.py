@@ -3,67 +3,56 @@
 Corrected Portfolio Analysis - Realistic Return Calculations
 """
 
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 import numpy as np
 import yfinance as yf
+from functools import lru_cache
+
+from financial.fin_market_data import clean_portfolio_symbols, top_k_weight
+
+# The broker export only changes when re-downloaded: memoize its parse on (path, mtime)
+@lru_cache(maxsize=4)
+def _load_portfolio(portfolio_file, mtime):
+    """Parse the broker portfolio export into one row per position"""
+    # The C tokenizer parses the European number format directly
+    df = pd.read_csv(portfolio_file, sep=';', skiprows=2, nrows=14,
+                     usecols=['Titolo', 'Simbolo', 'Valore di carico', 'Valore di mercato €', 'Var%'],
+                     decimal=',', thousands='.', dtype={'Simbolo': 'string', 'Titolo': 'string'})
+    
+    df = df[df['Simbolo'].notna() & (df['Simbolo'] != 'Totale')]
+    
+    # Numbers are already parsed by the reader; blank or malformed cells count as 0.0, as before
+    portfolio_df = pd.DataFrame({
+        'symbol': clean_portfolio_symbols(df['Simbolo']),
+        'name': df['Titolo'],
+        'current_value_eur': pd.to_numeric(df['Valore di mercato €'], errors='coerce').fillna(0.0),
+        'cost_basis_eur': pd.to_numeric(df['Valore di carico'], errors='coerce').fillna(0.0),
+        'actual_return_pct': pd.to_numeric(df['Var%'], errors='coerce').fillna(0.0)
+    }).reset_index(drop=True)
+    
+    return portfolio_df
 
 class RealisticPortfolioAnalyzer:
     def __init__(self):
         self.risk_free_rate = 0.05
         
-    def parse_european_number(self, value_str):
-        """Parse European number format"""
-        value_str = str(value_str).strip()
-        if value_str == 'nan' or value_str == '':
-            return 0.0
-        if ',' in value_str and '.' in value_str:
-            parts = value_str.split(',')
-            if len(parts) == 2:
-                integer_part = parts[0].replace('.', '')
-                decimal_part = parts[1]
-                value_str = integer_part + '.' + decimal_part
-        elif ',' in value_str:
-            value_str = value_str.replace(',', '.')
-        return float(value_str)
-    
     def calculate_realistic_portfolio_metrics(self):
         """Calculate realistic portfolio metrics from actual data"""
         print("📊 Calculating REALISTIC Portfolio Metrics...")
         
-        # Load portfolio
-        df = pd.read_csv('actual-portfolio-master.csv', sep=';', skiprows=2, nrows=14)
-        
-        portfolio_data = []
-        total_current_value = 0
-        total_cost_basis = 0
-        
-        for _, row in df.iterrows():
-            if pd.notna(row['Simbolo']) and row['Simbolo'] != 'Totale':
-                symbol = row['Simbolo'].split('.')[0]
-                if symbol.startswith('1'):
-                    symbol = symbol[1:]
-                
-                current_value = self.parse_european_number(row['Valore di mercato €'])
-                cost_basis = self.parse_european_number(row['Valore di carico'])
-                return_pct = self.parse_european_number(row['Var%'])
-                
-                portfolio_data.append({
-                    'symbol': symbol,
-                    'name': row['Titolo'],
-                    'current_value_eur': current_value,
-                    'cost_basis_eur': cost_basis,
-                    'actual_return_pct': return_pct,
-                    'weight': 0  # Will calculate
-                })
-                
-                total_current_value += current_value
-                total_cost_basis += cost_basis
-        
-        # Calculate weights and overall return
-        for position in portfolio_data:
-            position['weight'] = position['current_value_eur'] / total_current_value
-        
-        portfolio_df = pd.DataFrame(portfolio_data)
+        # Load portfolio (parsed once per file version)
+        portfolio_file = 'actual-portfolio-master.csv'
+        portfolio_df = _load_portfolio(portfolio_file, os.path.getmtime(portfolio_file)).copy()
+        
+        total_current_value = portfolio_df['current_value_eur'].sum()
+        total_cost_basis = portfolio_df['cost_basis_eur'].sum()
+        
+        # Calculate weights
+        portfolio_df['weight'] = portfolio_df['current_value_eur'] / total_current_value
         
         # REALISTIC portfolio return calculation
         # Method 1: Weighted average of actual position returns
@@ -93,7 +82,7 @@ class RealisticPortfolioAnalyzer:
         print(f"Target with +2pp improvement: {target_with_improvement:.1%}")
         
         # Risk assessment based on concentration
-        top_5_weight = portfolio_df.nlargest(5, 'weight')['weight'].sum()
+        top_5_weight = top_k_weight(portfolio_df['weight'], 5)
         tech_weight = 0.515  # From previous analysis
         
         risk_level = "High" if top_5_weight > 0.6 or tech_weight > 0.5 else "Medium"
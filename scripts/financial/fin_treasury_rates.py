@@ -4,12 +4,22 @@ Risk-Free Rate Calculator - Component A5
 Fetches current Treasury rates from yfinance for Sharpe ratio calculations
 """
 
-import yfinance as yf
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+import time
 import logging
 
+from financial.fin_market_data import get_yfinance_session, get_ticker
+
+# yfinance history periods and the calendar days they are guaranteed to cover, shortest first
+HISTORY_PERIODS = (("3mo", 89), ("6mo", 181), ("1y", 365), ("2y", 730), ("5y", 1826), ("10y", 3652))
+
 class TreasuryRateFetcher:
     """Fetch and calculate risk-free rates from Treasury data"""
     
@@ -25,33 +35,94 @@ class TreasuryRateFetcher:
             '1Y': '^TNX',    # 10-Year Treasury (closest to 1Y available)
             '10Y': '^TNX'    # 10-Year Treasury
         }
+        
+        # Same yfinance session as MarketDataCollector (None: yfinance keeps its own)
+        self.session = get_yfinance_session()
+        
+        # Short-lived memo of the last fetched rates (get_risk_free_rate, the average-rate
+        # fallback and get_rate_for_timeframe all go through fetch_current_treasury_rates)
+        self.rates_cache_ttl = 60  # Seconds
+        self._rates_cache = None
+        self._rates_cache_ts = 0.0
+        
+        # One history download per symbol serves both the latest rate and the
+        # 30-day average; cached as {(symbol, period): (timestamp, DataFrame)}
+        self.history_period = "3mo"
+        self._hist_cache = {}
+    
+    def _fetch_history(self, symbol, period=None):
+        """
+        Daily history for a Treasury symbol, reused for rates_cache_ttl seconds
+        
+        Args:
+            symbol: Yahoo symbol (e.g. '^IRX')
+            period: yfinance period string (defaults to self.history_period)
+            
+        Returns:
+            DataFrame: yfinance history (may be empty)
+        """
+        key = (symbol, period or self.history_period)
+        cached = self._hist_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.rates_cache_ttl:
+            return cached[1]
+        
+        hist = get_ticker(symbol, self.session).history(period=key[1])
+        if not hist.empty:
+            self._hist_cache[key] = (time.monotonic(), hist)
+        return hist
     
     def fetch_current_treasury_rates(self):
         """
         Fetch current Treasury rates across maturities
-        Returns: dict with rates by maturity
+        Returns: dict with rates by maturity (reused for rates_cache_ttl seconds)
         """
+        if self._rates_cache and time.monotonic() - self._rates_cache_ts < self.rates_cache_ttl:
+            return dict(self._rates_cache)
+        
         rates = {}
         
+        # Several maturities share a symbol: fetch each distinct symbol once, all concurrently
+        unique_symbols = list(dict.fromkeys(self.treasury_symbols.values()))
+        histories = {}
+        errors = {}
+        
         for maturity, symbol in self.treasury_symbols.items():
-            try:
-                self.logger.info(f"Fetching {maturity} Treasury rate ({symbol})")
-                
-                # Fetch recent data
-                treasury = yf.Ticker(symbol)
-                hist = treasury.history(period="5d")
-                
-                if not hist.empty:
-                    current_rate = hist['Close'].iloc[-1] / 100  # Convert percentage to decimal
-                    rates[maturity] = current_rate
-                    self.logger.info(f"✅ {maturity}: {current_rate:.4f} ({current_rate*100:.2f}%)")
-                else:
-                    self.logger.warning(f"⚠️ No data for {maturity} Treasury")
-                    
-            except Exception as e:
-                self.logger.error(f"❌ Failed to fetch {maturity} Treasury: {e}")
+            self.logger.info(f"Fetching {maturity} Treasury rate ({symbol})")
+        
+        with ThreadPoolExecutor(max_workers=len(unique_symbols), thread_name_prefix="treasury") as executor:
+            futures = {executor.submit(self._fetch_history, symbol): symbol
+                       for symbol in unique_symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    histories[symbol] = future.result()
+                except Exception as e:
+                    errors[symbol] = e
+        
+        for maturity, symbol in self.treasury_symbols.items():
+            if symbol in errors:
+                self.logger.error(f"❌ Failed to fetch {maturity} Treasury: {errors[symbol]}")
+                continue
+            
+            hist = histories[symbol]
+            if not hist.empty:
+                current_rate = hist['Close'].iloc[-1] / 100  # Convert percentage to decimal
+                rates[maturity] = current_rate
+                self.logger.info(f"✅ {maturity}: {current_rate:.4f} ({current_rate*100:.2f}%)")
+            else:
+                self.logger.warning(f"⚠️ No data for {maturity} Treasury")
                 
-        return rates
+        if rates:
+            self._rates_cache = rates
+            self._rates_cache_ts = time.monotonic()
+        
+        return dict(rates)
+    
+    def invalidate(self):
+        """Drop the memoized rates so the next call hits the network"""
+        self._rates_cache = None
+        self._rates_cache_ts = 0.0
+        self._hist_cache.clear()
     
     def get_risk_free_rate(self, period='3M'):
         """
@@ -93,15 +164,21 @@ class TreasuryRateFetcher:
             float: Average risk-free rate
         """
         try:
-            # Use 3-month Treasury for averaging
-            treasury = yf.Ticker('^IRX')
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            hist = treasury.history(start=start_date, end=end_date)
+            # Use 3-month Treasury for averaging; the shared history download covers
+            # the default window, longer windows pick the shortest period that fits
+            period = next((p for p, covered in HISTORY_PERIODS if days <= covered), "max")
+            hist = self._fetch_history('^IRX', period)
             
             if not hist.empty:
-                avg_rate = hist['Close'].mean() / 100  # Convert to decimal
+                start_date = pd.Timestamp(datetime.now() - timedelta(days=days))
+                if hist.index.tz is not None:
+                    start_date = start_date.tz_localize(hist.index.tz)
+                hist = hist[hist.index >= start_date]
+            close = hist['Close'].to_numpy(dtype=np.float64, copy=False) if 'Close' in hist else np.empty(0)
+            
+            # nanmean skips market-holiday gaps; an all-NaN window counts as no data
+            if close.size and not np.isnan(close).all():
+                avg_rate = float(np.nanmean(close)) * 0.01  # Convert to decimal
                 self.logger.info(f"📊 {days}-day average Treasury rate: {avg_rate:.4f} ({avg_rate*100:.2f}%)")
                 return avg_rate
             else:
@@ -6,14 +6,45 @@ Implements rigorous mean-variance optimization using quadratic programming
 
 import numpy as np
 import pandas as pd
-from scipy.optimize import minimize
+from scipy.optimize import minimize, OptimizeResult
 from scipy import linalg
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from collections import OrderedDict
+import hashlib
 import logging
 from typing import Dict, List, Tuple, Optional
 import warnings
 
+# Optional dedicated QP solver; SLSQP remains the fallback
+try:
+    import osqp
+    from scipy import sparse
+    OSQP_AVAILABLE = True
+except ImportError:
+    OSQP_AVAILABLE = False
+
+# Optional JIT for the portfolio statistics evaluated inside SLSQP callbacks
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 warnings.filterwarnings('ignore')
 
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _port_stats(w, mu, C):
+        """Portfolio (w.mu, w'Cw, Cw) in one compiled call"""
+        grad = C @ w
+        return w @ mu, w @ grad, grad
+else:
+    def _port_stats(w, mu, C):
+        """Portfolio (w.mu, w'Cw, Cw)"""
+        grad = C @ w
+        return w @ mu, w @ grad, grad
+
 class MarkowitzOptimizer:
     """Rigorous Markowitz mean-variance portfolio optimization"""
     
@@ -25,6 +56,48 @@ class MarkowitzOptimizer:
         # Optimization parameters
         self.max_iterations = 1000
         self.tolerance = 1e-8
+        self.warm_start_iterations = 50
+        
+        # LRU cache of minimize_variance_target_return results
+        self.result_cache_size = 256
+        self._result_cache = OrderedDict()
+        
+        # (covariance, Cholesky factor) from the last successful validate_inputs
+        self._validated_factor = None
+    
+    def _kkt_min_variance(self, cov_factor, mu: np.ndarray, target_return: float) -> Optional[np.ndarray]:
+        """
+        Closed-form minimum-variance weights for a target return
+        
+        Solves the KKT system of min w'Σw s.t. 1'w = 1, μ'w = target using
+        a = Σ⁻¹1 and b = Σ⁻¹μ. Returns None when the 2x2 system is singular
+        or the solution would need short positions (long-only bounds binding).
+        
+        Args:
+            cov_factor: Cholesky factor of the covariance matrix (scipy cho_factor)
+            mu: Expected returns as ndarray
+            target_return: Target portfolio return
+            
+        Returns:
+            ndarray of weights, or None if SLSQP is required
+        """
+        a = linalg.cho_solve(cov_factor, np.ones_like(mu))
+        b = linalg.cho_solve(cov_factor, mu)
+        
+        A = a.sum()
+        B = b.sum()
+        C = mu @ b
+        det = A * C - B * B
+        if not np.isfinite(det) or abs(det) < 1e-14 * max(A * C, 1e-300):
+            return None
+        
+        lam1 = (C - B * target_return) / det
+        lam2 = (A * target_return - B) / det
+        weights = lam1 * a + lam2 * b
+        
+        if np.any(weights < 0):
+            return None
+        return weights
     
     def validate_inputs(self, expected_returns: pd.Series, cov_matrix: pd.DataFrame) -> bool:
         """
@@ -42,29 +115,65 @@ class MarkowitzOptimizer:
             self.logger.error("❌ Dimension mismatch between returns and covariance matrix")
             return False
         
-        # Check covariance matrix is symmetric
-        if not np.allclose(cov_matrix, cov_matrix.T):
-            self.logger.error("❌ Covariance matrix is not symmetric")
-            return False
+        mu = np.asarray(expected_returns.values, dtype=np.float64)
+        C = np.asarray(cov_matrix.values, dtype=np.float64)
         
-        # Check covariance matrix is positive semi-definite
-        eigenvals = np.linalg.eigvals(cov_matrix)
-        if np.any(eigenvals < -1e-8):  # Allow small numerical errors
-            self.logger.error("❌ Covariance matrix is not positive semi-definite")
-            return False
-        
-        # Check for NaN/infinite values
-        if expected_returns.isna().any() or np.isinf(expected_returns).any():
+        # Check for NaN/infinite values (one isfinite sweep each, before any linear algebra)
+        if not np.isfinite(mu).all():
             self.logger.error("❌ Expected returns contain NaN or infinite values")
             return False
         
-        if cov_matrix.isna().any().any() or np.isinf(cov_matrix).any().any():
+        if not np.isfinite(C).all():
             self.logger.error("❌ Covariance matrix contains NaN or infinite values")
             return False
         
+        # Check covariance matrix is symmetric
+        if not np.allclose(C, C.T):
+            self.logger.error("❌ Covariance matrix is not symmetric")
+            return False
+        
+        # Check covariance matrix is positive semi-definite. A successful Cholesky
+        # proves it (positive definite) at half the cost of an eigendecomposition,
+        # and the factor is kept for the solvers; only singular/indefinite
+        # matrices need the eigenvalue check
+        C = np.ascontiguousarray(C)
+        self._validated_factor = None
+        cov_factor = self._cholesky(C)
+        if cov_factor is not None:
+            self._validated_factor = (C.copy(), cov_factor)
+        else:
+            # Symmetric solver: real eigenvalues, faster and more stable than eigvals
+            eigenvals = np.linalg.eigvalsh(C)
+            if np.any(eigenvals < -1e-8):  # Allow small numerical errors
+                self.logger.error("❌ Covariance matrix is not positive semi-definite")
+                return False
+        
         self.logger.info("✅ Input validation passed")
         return True
     
+    def _tangency_weights(self, C: np.ndarray, excess: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Closed-form maximum Sharpe (tangency) weights, w ∝ Σ⁻¹(μ - r_f)
+        
+        Returns None when the covariance is not positive definite, when the
+        excess returns give no positive-Sharpe portfolio, or when the solution
+        would need short positions; callers then fall back to SLSQP.
+        """
+        cov_factor = self._cholesky(C)
+        if cov_factor is None:
+            return None
+        
+        z = linalg.cho_solve(cov_factor, excess)
+        total = z.sum()
+        # A non-positive sum normalizes to the minimum-Sharpe portfolio instead
+        if not np.isfinite(total) or total <= 0:
+            return None
+        
+        weights = z / total
+        if np.any(weights < 0):
+            return None
+        return weights
+    
     def minimize_variance_target_return(self, expected_returns: pd.Series, cov_matrix: pd.DataFrame, 
                                       target_return: float, constraints: Dict = None) -> Dict:
         """
@@ -79,72 +188,43 @@ class MarkowitzOptimizer:
         Returns:
             Dict with optimization results
         """
-        if not self.validate_inputs(expected_returns, cov_matrix):
-            return {'success': False, 'message': 'Input validation failed'}
+        mu, C, index = self._prepare(expected_returns, cov_matrix)
         
-        n_assets = len(expected_returns)
+        # Identical (mu, cov, target, constraints) were already validated and solved
+        cache_key = self._result_cache_key(mu, C, index, target_return, constraints)
+        cached = self._result_cache.get(cache_key)
+        if cached is not None:
+            self._result_cache.move_to_end(cache_key)
+            self.logger.debug("♻️ Using cached optimization result")
+            return self._copy_result(cached)
         
-        # Objective function: minimize 0.5 * w^T * Cov * w
-        def objective(weights):
-            return 0.5 * np.dot(weights, np.dot(cov_matrix.values, weights))
-        
-        # Gradient of objective function
-        def gradient(weights):
-            return np.dot(cov_matrix.values, weights)
-        
-        # Constraints
-        constraints_list = [
-            # Return constraint: w^T * r = target_return
-            {'type': 'eq', 'fun': lambda w: np.dot(w, expected_returns.values) - target_return},
-            # Sum to 1 constraint: sum(w) = 1
-            {'type': 'eq', 'fun': lambda w: np.sum(w) - 1}
-        ]
+        if not self.validate_inputs(expected_returns, cov_matrix):
+            return {'success': False, 'message': 'Input validation failed'}
         
-        # Add custom constraints if provided
-        if constraints:
-            if 'max_weight' in constraints:
-                # Individual position limits
-                for i in range(n_assets):
-                    constraints_list.append({
-                        'type': 'ineq', 
-                        'fun': lambda w, i=i: constraints['max_weight'] - w[i]
-                    })
-            
-            if 'sector_limits' in constraints:
-                # Sector concentration limits
-                for sector, (indices, limit) in constraints['sector_limits'].items():
-                    constraints_list.append({
-                        'type': 'ineq',
-                        'fun': lambda w, indices=indices, limit=limit: limit - np.sum(w[indices])
-                    })
+        opt_result = self._minimize_variance_arrays(mu, C, index, target_return, constraints)
         
-        # Bounds: allow long positions only (can be modified for long/short)
-        bounds = [(0, 1) for _ in range(n_assets)]
-        
-        # Initial guess: equal weights
-        x0 = np.ones(n_assets) / n_assets
+        # Only successes are memoized: a failure may be transient (solver/JIT error) and is retried
+        if opt_result['success']:
+            self._result_cache[cache_key] = opt_result
+            while len(self._result_cache) > self.result_cache_size:
+                self._result_cache.popitem(last=False)
+        return self._copy_result(opt_result)
+    
+    def _minimize_variance_arrays(self, mu: np.ndarray, C: np.ndarray, index: pd.Index,
+                                  target_return: float, constraints: Dict = None) -> Dict:
+        """Body of minimize_variance_target_return on validated, prepared arrays"""
+        cov_factor = self._cholesky(C) if not constraints else None
         
-        # Optimize
         try:
-            result = minimize(
-                objective,
-                x0,
-                method='SLSQP',
-                jac=gradient,
-                bounds=bounds,
-                constraints=constraints_list,
-                options={
-                    'ftol': self.tolerance,
-                    'disp': False,
-                    'maxiter': self.max_iterations
-                }
+            weights_arr, result = self._min_var_given_cholesky(
+                cov_factor, mu, C, target_return, constraints=constraints
             )
             
-            if result.success:
-                weights = pd.Series(result.x, index=expected_returns.index)
-                portfolio_return = np.dot(weights, expected_returns)
-                portfolio_variance = np.dot(weights, np.dot(cov_matrix, weights))
+            if weights_arr is not None:
+                portfolio_return = weights_arr @ mu
+                portfolio_variance = weights_arr @ C @ weights_arr
                 portfolio_volatility = np.sqrt(portfolio_variance)
+                weights = pd.Series(weights_arr, index=index)
                 
                 self.logger.info(f"✅ Optimization successful: Return={portfolio_return:.4f}, Vol={portfolio_volatility:.4f}")
                 
@@ -164,6 +244,239 @@ class MarkowitzOptimizer:
             self.logger.error(f"❌ Optimization error: {e}")
             return {'success': False, 'message': str(e)}
     
+    def _result_cache_key(self, mu: np.ndarray, C: np.ndarray, index: pd.Index,
+                          target_return: float, constraints: Dict = None) -> Tuple:
+        """Hashable fingerprint of an optimization problem for the result cache"""
+        digest = hashlib.md5(mu.tobytes())
+        digest.update(C.tobytes())
+        digest.update('|'.join(map(str, index)).encode())
+        return digest.hexdigest(), round(float(target_return), 10), self._freeze(constraints)
+    
+    def _freeze(self, value):
+        """Recursively convert constraint dicts/lists/arrays into hashable tuples"""
+        if isinstance(value, dict):
+            return tuple(sorted((str(k), self._freeze(v)) for k, v in value.items()))
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return tuple(self._freeze(v) for v in value)
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+    
+    def _copy_result(self, result: Dict) -> Dict:
+        """Shallow copy of a cached result with its own weights Series"""
+        result = dict(result)
+        if 'weights' in result:
+            result['weights'] = result['weights'].copy()
+        return result
+    
+    def _prepare(self, expected_returns: pd.Series, cov_matrix: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, pd.Index]:
+        """Contiguous float64 (mu, C) arrays for BLAS plus the asset index for the results"""
+        mu = np.ascontiguousarray(expected_returns.values, dtype=np.float64)
+        C = np.ascontiguousarray(cov_matrix.values, dtype=np.float64)
+        return mu, C, expected_returns.index
+    
+    def _cholesky(self, C: np.ndarray):
+        """Cholesky factor of the covariance matrix, or None if it is not positive definite"""
+        # Reuse the factor computed by validate_inputs for the same matrix
+        if self._validated_factor is not None:
+            validated_C, cov_factor = self._validated_factor
+            if validated_C.shape == C.shape and np.array_equal(validated_C, C):
+                return cov_factor
+        
+        try:
+            return linalg.cho_factor(C, lower=True, check_finite=False)
+        except (linalg.LinAlgError, ValueError):
+            return None
+    
+    def _sector_matrix(self, sector_limits: Dict, n_assets: int) -> Tuple[np.ndarray, np.ndarray]:
+        """0/1 sector membership matrix (n_sectors x n_assets) and the matching limits"""
+        A_sector = np.zeros((len(sector_limits), n_assets))
+        limits = np.empty(len(sector_limits))
+        for k, (indices, limit) in enumerate(sector_limits.values()):
+            A_sector[k, indices] = 1.0
+            limits[k] = limit
+        return A_sector, limits
+    
+    def _inequality_constraints(self, constraints: Dict, n_assets: int, include_sectors: bool = True) -> List[Dict]:
+        """
+        SLSQP inequality constraints for max_weight and sector_limits
+        
+        Each family becomes a single vector-valued constraint with a constant
+        Jacobian, so SLSQP makes one callback (one gemv) per family instead of
+        one Python lambda per asset or sector.
+        """
+        constraints_list = []
+        if not constraints:
+            return constraints_list
+        
+        if 'max_weight' in constraints:
+            # Individual position limits
+            max_weight = constraints['max_weight']
+            neg_eye = -np.eye(n_assets)
+            constraints_list.append({
+                'type': 'ineq',
+                'fun': lambda w: max_weight - w,
+                'jac': lambda w: neg_eye
+            })
+        
+        if include_sectors and constraints.get('sector_limits'):
+            # Sector concentration limits
+            A_sector, limits = self._sector_matrix(constraints['sector_limits'], n_assets)
+            neg_A = -A_sector
+            constraints_list.append({
+                'type': 'ineq',
+                'fun': lambda w: limits - A_sector @ w,
+                'jac': lambda w: neg_A
+            })
+        
+        return constraints_list
+    
+    def _osqp_problem(self, mu: np.ndarray, C: np.ndarray, constraints: Dict = None):
+        """
+        Set up the target-return QP once for OSQP
+        
+        Constraint rows are [mu'; 1'; I; sector rows]. The first row's bounds
+        carry the target return, so frontier points only need an update of l/u
+        (no refactorization).
+        
+        Returns:
+            Tuple of (OSQP problem, lower bounds, upper bounds)
+        """
+        n_assets = len(mu)
+        
+        weight_upper = np.ones(n_assets)
+        if constraints and 'max_weight' in constraints:
+            weight_upper = np.minimum(weight_upper, constraints['max_weight'])
+        
+        rows = [mu[np.newaxis, :], np.ones((1, n_assets)), np.eye(n_assets)]
+        lower = [np.zeros(1), np.ones(1), np.zeros(n_assets)]
+        upper = [np.zeros(1), np.ones(1), weight_upper]
+        
+        if constraints and constraints.get('sector_limits'):
+            A_sector, limits = self._sector_matrix(constraints['sector_limits'], n_assets)
+            rows.append(A_sector)
+            lower.append(np.full(len(limits), -np.inf))
+            upper.append(limits)
+        
+        l = np.concatenate(lower)
+        u = np.concatenate(upper)
+        
+        prob = osqp.OSQP()
+        prob.setup(
+            P=sparse.csc_matrix(np.triu(C)),
+            q=np.zeros(n_assets),
+            A=sparse.csc_matrix(np.vstack(rows)),
+            l=l,
+            u=u,
+            eps_abs=self.tolerance,
+            eps_rel=self.tolerance,
+            max_iter=self.max_iterations * 10,
+            polish=True,
+            verbose=False
+        )
+        return prob, l, u
+    
+    def _solve_qp_osqp(self, qp, target_return: float, warm_start: Optional[np.ndarray] = None):
+        """
+        Solve the prepared OSQP problem for one target return
+        
+        Returns:
+            Tuple of (weights ndarray or None, OptimizeResult describing a failure or None)
+        """
+        prob, l, u = qp
+        l[0] = u[0] = target_return
+        prob.update(l=l, u=u)
+        if warm_start is not None:
+            prob.warm_start(x=warm_start)
+        
+        res = prob.solve()
+        status = str(res.info.status).lower()
+        if status == 'solved':
+            return res.x, None
+        if 'infeasible' in status and 'inaccurate' not in status:
+            return None, OptimizeResult(success=False, message=f"OSQP: {res.info.status}")
+        # Inaccurate / iteration limit: let SLSQP have a go
+        return None, None
+    
+    def _min_var_given_cholesky(self, cov_factor, mu: np.ndarray, C: np.ndarray, target_return: float,
+                                x0: Optional[np.ndarray] = None, constraints: Dict = None,
+                                max_iterations: Optional[int] = None, qp=None):
+        """
+        Minimum-variance weights for a target return on pre-validated arrays
+        
+        Uses the closed-form KKT solution when there are no custom constraints
+        and a Cholesky factor is available, then OSQP when installed, and
+        otherwise runs SLSQP from x0.
+        
+        Args:
+            cov_factor: Cholesky factor of C (scipy cho_factor) or None
+            mu: Expected returns as ndarray
+            C: Covariance matrix as ndarray
+            target_return: Target portfolio return
+            x0: Initial guess for SLSQP/OSQP (equal weights if None)
+            constraints: Additional constraints dict
+            max_iterations: SLSQP iteration cap (defaults to self.max_iterations)
+            qp: Prepared OSQP problem from _osqp_problem (built here if None)
+            
+        Returns:
+            Tuple of (weights ndarray or None on failure, solver result or None)
+        """
+        if not constraints and cov_factor is not None:
+            kkt_weights = self._kkt_min_variance(cov_factor, mu, target_return)
+            if kkt_weights is not None:
+                return kkt_weights, None
+        
+        if OSQP_AVAILABLE:
+            if qp is None:
+                qp = self._osqp_problem(mu, C, constraints)
+            weights, failure = self._solve_qp_osqp(qp, target_return, warm_start=x0)
+            if weights is not None or failure is not None:
+                return weights, failure
+        
+        n_assets = len(mu)
+        
+        # Objective function: minimize 0.5 * w^T * Cov * w
+        def objective(weights):
+            return 0.5 * _port_stats(weights, mu, C)[1]
+        
+        # Gradient of objective function
+        def gradient(weights):
+            return _port_stats(weights, mu, C)[2]
+        
+        # Constraints
+        constraints_list = [
+            # Return constraint: w^T * r = target_return
+            {'type': 'eq', 'fun': lambda w: w @ mu - target_return},
+            # Sum to 1 constraint: sum(w) = 1
+            {'type': 'eq', 'fun': lambda w: np.sum(w) - 1}
+        ]
+        
+        # Add custom constraints if provided
+        constraints_list.extend(self._inequality_constraints(constraints, n_assets))
+        
+        # Bounds: allow long positions only (can be modified for long/short)
+        bounds = [(0, 1) for _ in range(n_assets)]
+        
+        # Initial guess: previous frontier point if given, else equal weights
+        if x0 is None:
+            x0 = np.ones(n_assets) / n_assets
+        
+        result = minimize(
+            objective,
+            x0,
+            method='SLSQP',
+            jac=gradient,
+            bounds=bounds,
+            constraints=constraints_list,
+            options={
+                'ftol': self.tolerance,
+                'disp': False,
+                'maxiter': max_iterations or self.max_iterations
+            }
+        )
+        
+        return (result.x if result.success else None), result
+    
     def maximize_sharpe_ratio(self, expected_returns: pd.Series, cov_matrix: pd.DataFrame, 
                              risk_free_rate: float, constraints: Dict = None) -> Dict:
         """
@@ -181,15 +494,15 @@ class MarkowitzOptimizer:
         if not self.validate_inputs(expected_returns, cov_matrix):
             return {'success': False, 'message': 'Input validation failed'}
         
-        # Excess returns
-        excess_returns = expected_returns - risk_free_rate
+        mu, C, index = self._prepare(expected_returns, cov_matrix)
+        n_assets = len(mu)
         
-        n_assets = len(expected_returns)
+        # Excess returns (ndarray, bound once for the SLSQP callbacks)
+        excess = mu - risk_free_rate
         
         # Objective function: minimize -(excess_return / volatility)
         def objective(weights):
-            portfolio_return = np.dot(weights, excess_returns.values)
-            portfolio_variance = np.dot(weights, np.dot(cov_matrix.values, weights))
+            portfolio_return, portfolio_variance, _ = _port_stats(weights, excess, C)
             
             if portfolio_variance <= 0:
                 return 1e10  # Large penalty for invalid portfolios
@@ -203,66 +516,106 @@ class MarkowitzOptimizer:
         ]
         
         # Add custom constraints
-        if constraints:
-            if 'max_weight' in constraints:
-                for i in range(n_assets):
-                    constraints_list.append({
-                        'type': 'ineq', 
-                        'fun': lambda w, i=i: constraints['max_weight'] - w[i]
-                    })
-            
-            if 'sector_limits' in constraints:
-                for sector, (indices, limit) in constraints['sector_limits'].items():
-                    constraints_list.append({
-                        'type': 'ineq',
-                        'fun': lambda w, indices=indices, limit=limit: limit - np.sum(w[indices])
-                    })
+        constraints_list.extend(self._inequality_constraints(constraints, n_assets))
         
         bounds = [(0, 1) for _ in range(n_assets)]
         x0 = np.ones(n_assets) / n_assets
         
         try:
-            result = minimize(
-                objective,
-                x0,
-                method='SLSQP',
-                bounds=bounds,
-                constraints=constraints_list,
-                options={
-                    'ftol': self.tolerance,
-                    'disp': False,
-                    'maxiter': self.max_iterations
-                }
-            )
+            # Only budget constraint: closed-form tangency portfolio, SLSQP otherwise
+            weights_arr = self._tangency_weights(C, excess) if not constraints else None
+            result = None
             
-            if result.success:
-                weights = pd.Series(result.x, index=expected_returns.index)
-                portfolio_return = np.dot(weights, expected_returns)
-                portfolio_variance = np.dot(weights, np.dot(cov_matrix, weights))
-                portfolio_volatility = np.sqrt(portfolio_variance)
-                sharpe_ratio = (portfolio_return - risk_free_rate) / portfolio_volatility
-                
-                self.logger.info(f"✅ Max Sharpe optimization: Sharpe={sharpe_ratio:.4f}, Return={portfolio_return:.4f}")
+            if weights_arr is None:
+                result = minimize(
+                    objective,
+                    x0,
+                    method='SLSQP',
+                    bounds=bounds,
+                    constraints=constraints_list,
+                    options={
+                        'ftol': self.tolerance,
+                        'disp': False,
+                        'maxiter': self.max_iterations
+                    }
+                )
                 
-                return {
-                    'success': True,
-                    'weights': weights,
-                    'portfolio_return': portfolio_return,
-                    'portfolio_volatility': portfolio_volatility,
-                    'portfolio_variance': portfolio_variance,
-                    'sharpe_ratio': sharpe_ratio,
-                    'solver_result': result
-                }
-            else:
-                self.logger.error(f"❌ Max Sharpe optimization failed: {result.message}")
-                return {'success': False, 'message': result.message}
+                if not result.success:
+                    self.logger.error(f"❌ Max Sharpe optimization failed: {result.message}")
+                    return {'success': False, 'message': result.message}
+                weights_arr = result.x
+            
+            portfolio_return = weights_arr @ mu
+            portfolio_variance = weights_arr @ C @ weights_arr
+            portfolio_volatility = np.sqrt(portfolio_variance)
+            weights = pd.Series(weights_arr, index=index)
+            sharpe_ratio = (portfolio_return - risk_free_rate) / portfolio_volatility
+            
+            self.logger.info(f"✅ Max Sharpe optimization: Sharpe={sharpe_ratio:.4f}, Return={portfolio_return:.4f}")
+            
+            return {
+                'success': True,
+                'weights': weights,
+                'portfolio_return': portfolio_return,
+                'portfolio_volatility': portfolio_volatility,
+                'portfolio_variance': portfolio_variance,
+                'sharpe_ratio': sharpe_ratio,
+                'solver_result': result
+            }
                 
         except Exception as e:
             self.logger.error(f"❌ Max Sharpe optimization error: {e}")
             return {'success': False, 'message': str(e)}
     
+    def _gmv_return(self, mu: np.ndarray, C: np.ndarray, constraints: Dict = None) -> float:
+        """
+        Expected return of the (long-only) global minimum-variance portfolio
+        
+        Closed form w = Σ⁻¹1 / 1'Σ⁻¹1 when that is already long-only and
+        unconstrained, a single SLSQP solve otherwise; min(mu) if both fail.
+        """
+        n_assets = len(mu)
+        cov_factor = self._cholesky(C)
+        
+        if not constraints and cov_factor is not None:
+            a = linalg.cho_solve(cov_factor, np.ones(n_assets))
+            weights = a / a.sum()
+            if np.all(weights >= 0):
+                return float(weights @ mu)
+        
+        constraints_list = [{'type': 'eq', 'fun': lambda w: np.sum(w) - 1, 'jac': lambda w: np.ones(n_assets)}]
+        constraints_list.extend(self._inequality_constraints(constraints, n_assets))
+        
+        result = minimize(
+            lambda w: 0.5 * _port_stats(w, mu, C)[1],
+            np.ones(n_assets) / n_assets,
+            method='SLSQP',
+            jac=lambda w: _port_stats(w, mu, C)[2],
+            bounds=[(0, 1) for _ in range(n_assets)],
+            constraints=constraints_list,
+            options={'ftol': self.tolerance, 'disp': False, 'maxiter': self.max_iterations}
+        )
+        if result.success:
+            return float(np.clip(result.x @ mu, mu.min(), mu.max()))
+        return float(mu.min())
+    
+    def _solve_frontier_point(self, mu: np.ndarray, C: np.ndarray, target_return: float,
+                              constraints: Dict = None, cov_factor=None,
+                              x0: Optional[np.ndarray] = None,
+                              max_iterations: Optional[int] = None, qp=None) -> Optional[np.ndarray]:
+        """Solve one efficient frontier point, returning weights or None on failure"""
+        try:
+            weights_arr, _ = self._min_var_given_cholesky(
+                cov_factor, mu, C, target_return, x0=x0, constraints=constraints,
+                max_iterations=max_iterations, qp=qp
+            )
+            return weights_arr
+        except Exception as e:
+            self.logger.error(f"❌ Optimization error: {e}")
+            return None
+    
     def efficient_frontier(self, expected_returns: pd.Series, cov_matrix: pd.DataFrame, 
-                          n_points: int = 50, constraints: Dict = None) -> pd.DataFrame:
+                          n_points: int = 50, constraints: Dict = None, n_jobs: int = 1) -> pd.DataFrame:
         """
         Calculate the efficient frontier
         
@@ -271,6 +624,8 @@ class MarkowitzOptimizer:
             cov_matrix: Covariance matrix
             n_points: Number of points on the frontier
             constraints: Additional constraints dict
+            n_jobs: Worker processes for constrained frontiers (1 = serial with
+                warm starts, <= 0 = one per CPU)
             
         Returns:
             DataFrame with efficient frontier points
@@ -278,31 +633,67 @@ class MarkowitzOptimizer:
         if not self.validate_inputs(expected_returns, cov_matrix):
             return pd.DataFrame()
         
-        # Calculate range of returns
-        min_return = expected_returns.min()
-        max_return = expected_returns.max()
+        # Validate, convert and factor once; every target return reuses them
+        mu, C, index = self._prepare(expected_returns, cov_matrix)
+        cov_factor = self._cholesky(C) if not constraints else None
+        
+        # Calculate range of returns. Targets below the global minimum-variance
+        # portfolio's return lie on the inefficient lower branch of the frontier
+        # hyperbola, so the sweep starts at the GMV return by design
+        min_return = self._gmv_return(mu, C, constraints)
+        max_return = mu.max()
         
         # Generate target returns
         target_returns = np.linspace(min_return, max_return, n_points)
         
-        frontier_results = []
+        # One row of weights per target return; rows left NaN mark failed points
+        W = np.full((n_points, len(mu)), np.nan)
+        
+        if n_jobs != 1 and constraints:
+            # Constrained points are independent SLSQP problems; SLSQP holds the GIL,
+            # so solve them cold in worker processes (order is preserved by map)
+            with ProcessPoolExecutor(max_workers=n_jobs if n_jobs > 0 else None) as executor:
+                solutions = executor.map(
+                    self._solve_frontier_point, repeat(mu), repeat(C), target_returns, repeat(constraints)
+                )
+                for i, weights_arr in enumerate(solutions):
+                    if weights_arr is not None:
+                        W[i] = weights_arr
+        else:
+            x0 = None
+            # OSQP: factor the KKT matrix once, then only the target bounds change per point
+            qp = self._osqp_problem(mu, C, constraints) if OSQP_AVAILABLE else None
+            
+            for i, target_return in enumerate(target_returns):
+                weights_arr = None
+                if x0 is not None:
+                    # Warm start from the adjacent frontier point; converges in a few
+                    # iterations when feasible, so cap it and retry cold if it stalls
+                    weights_arr = self._solve_frontier_point(
+                        mu, C, target_return, constraints, cov_factor, x0, self.warm_start_iterations, qp
+                    )
+                if weights_arr is None:
+                    weights_arr = self._solve_frontier_point(mu, C, target_return, constraints, cov_factor, qp=qp)
+                
+                x0 = weights_arr
+                if weights_arr is not None:
+                    W[i] = weights_arr
         
-        for target_return in target_returns:
-            result = self.minimize_variance_target_return(
-                expected_returns, cov_matrix, target_return, constraints
-            )
+        solved = ~np.isnan(W[:, 0])
+        
+        if solved.any():
+            W = W[solved]
+            # Returns and volatilities for all points in two batched products
+            portfolio_returns = W @ mu
+            portfolio_volatilities = np.sqrt(np.einsum('ij,jk,ik->i', W, C, W))
             
-            if result['success']:
-                frontier_results.append({
-                    'target_return': target_return,
-                    'portfolio_return': result['portfolio_return'],
-                    'portfolio_volatility': result['portfolio_volatility'],
-                    'weights': result['weights']
-                })
-        
-        if frontier_results:
-            self.logger.info(f"✅ Efficient frontier calculated: {len(frontier_results)} points")
-            return pd.DataFrame(frontier_results)
+            self.logger.info(f"✅ Efficient frontier calculated: {len(W)} points")
+            return pd.DataFrame({
+                'target_return': target_returns[solved],
+                'portfolio_return': portfolio_returns,
+                'portfolio_volatility': portfolio_volatilities,
+                'weights': [pd.Series(row, index=index) for row in W]
+            })
         else:
             self.logger.error("❌ Failed to calculate efficient frontier")
             return pd.DataFrame()
@@ -324,27 +715,31 @@ class MarkowitzOptimizer:
         if not self.validate_inputs(expected_returns, cov_matrix):
             return {'success': False, 'message': 'Input validation failed'}
         
-        n_assets = len(expected_returns)
+        mu, C, index = self._prepare(expected_returns, cov_matrix)
+        n_assets = len(mu)
+        
+        target_variance = target_volatility ** 2
         
         # Objective function: maximize return
         def objective(weights):
-            return -np.dot(weights, expected_returns.values)  # Minimize negative return
+            return -(weights @ mu)  # Minimize negative return
         
-        # Constraints
+        # Gradient of objective function (linear, so constant)
+        def gradient(weights):
+            return -mu
+        
+        # Constraints (analytic Jacobians avoid finite-difference evaluations)
         constraints_list = [
-            {'type': 'eq', 'fun': lambda w: np.sum(w) - 1},  # Sum to 1
-            # Volatility constraint: sqrt(w^T * Cov * w) = target_volatility
-            {'type': 'eq', 'fun': lambda w: np.sqrt(np.dot(w, np.dot(cov_matrix.values, w))) - target_volatility}
+            {'type': 'eq', 'fun': lambda w: np.sum(w) - 1,  # Sum to 1
+             'jac': lambda w: np.ones(n_assets)},
+            # Volatility constraint in variance form: w^T * Cov * w = target_volatility^2
+            # (smooth everywhere, unlike the sqrt at w = 0)
+            {'type': 'eq', 'fun': lambda w: _port_stats(w, mu, C)[1] - target_variance,
+             'jac': lambda w: 2.0 * _port_stats(w, mu, C)[2]}
         ]
         
-        # Add custom constraints
-        if constraints:
-            if 'max_weight' in constraints:
-                for i in range(n_assets):
-                    constraints_list.append({
-                        'type': 'ineq', 
-                        'fun': lambda w, i=i: constraints['max_weight'] - w[i]
-                    })
+        # Add custom constraints (position limits only)
+        constraints_list.extend(self._inequality_constraints(constraints, n_assets, include_sectors=False))
         
         bounds = [(0, 1) for _ in range(n_assets)]
         x0 = np.ones(n_assets) / n_assets
@@ -354,6 +749,7 @@ class MarkowitzOptimizer:
                 objective,
                 x0,
                 method='SLSQP',
+                jac=gradient,
                 bounds=bounds,
                 constraints=constraints_list,
                 options={
@@ -364,10 +760,10 @@ class MarkowitzOptimizer:
             )
             
             if result.success:
-                weights = pd.Series(result.x, index=expected_returns.index)
-                portfolio_return = np.dot(weights, expected_returns)
-                portfolio_variance = np.dot(weights, np.dot(cov_matrix, weights))
+                portfolio_return = result.x @ mu
+                portfolio_variance = result.x @ C @ result.x
                 portfolio_volatility = np.sqrt(portfolio_variance)
+                weights = pd.Series(result.x, index=index)
                 
                 self.logger.info(f"✅ Target volatility optimization: Vol={portfolio_volatility:.4f}, Return={portfolio_return:.4f}")
                 
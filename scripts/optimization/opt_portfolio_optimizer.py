@@ -4,24 +4,223 @@ Tigro Portfolio Optimization System - Complete Implementation
 Advanced portfolio analysis with sentiment integration and optimization
 """
 
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 import numpy as np
 import yfinance as yf
 import warnings
 import time
-import os
+import logging
 import glob
-from datetime import datetime, timedelta
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from scipy.optimize import minimize
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+# Optional dedicated QP solver for solve_markowitz; SLSQP remains the fallback
+try:
+    import osqp
+    from scipy import sparse
+    OSQP_AVAILABLE = True
+except ImportError:
+    OSQP_AVAILABLE = False
+
+# Ledoit-Wolf shrinkage intensity; a local copy of the same formula is used without sklearn
+try:
+    from sklearn.covariance import ledoit_wolf_shrinkage
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+from financial.fin_market_data import (get_yfinance_session, cached_history, cached_info, download_histories,
+                                        portfolio_frame, MARKET_DATA_CACHE_DIR)
+
 warnings.filterwarnings('ignore')
 
+# Sentiment record fields and the value used when a column is absent from the file
+SENTIMENT_DEFAULTS = {'sentiment_score': 0, 'sentiment_label': 'neutral', 'confidence': 0, 'article_count': 0}
+
+# CSV inputs only change when rewritten: parse results are memoized on (path, mtime)
+# so a touched file is re-read. Callers get the shared object and must not mutate it.
+# Broker export columns used by load_portfolio, read as plain strings (numbers are European-formatted)
+PORTFOLIO_COLUMNS = ['Simbolo', 'Titolo', 'Quantità', 'P.zo medio di carico', 'Valore di mercato €', 'Var%']
+
+@lru_cache(maxsize=8)
+def _read_portfolio_csv(portfolio_file, mtime):
+    """Read the broker portfolio export"""
+    return pd.read_csv(portfolio_file, sep=';', skiprows=2, nrows=14, usecols=PORTFOLIO_COLUMNS,
+                       dtype='string', engine='c')
+
+@lru_cache(maxsize=4)
+def _load_sentiment_cached(sentiment_file, mtime):
+    """Per-symbol sentiment records (cleaned upper-case symbol -> fields) from a detailed sentiment file"""
+    df = pd.read_csv(sentiment_file, usecols=lambda col: col == 'symbol' or col in SENTIMENT_DEFAULTS,
+                     dtype={'symbol': 'string'})
+    if 'symbol' not in df:
+        return {}
+    
+    df = df.assign(**{col: default for col, default in SENTIMENT_DEFAULTS.items() if col not in df})
+    df['symbol'] = df['symbol'].astype('string').str.strip().str.upper()
+    df = df[df['symbol'].notna() & (df['symbol'] != '')].drop_duplicates('symbol', keep='last')
+    return df.set_index('symbol')[list(SENTIMENT_DEFAULTS)].to_dict(orient='index')
+
+# Scalar fields of the per-symbol market/sentiment records, tabulated for joins
+MARKET_COLUMNS = ['symbol', 'current_price', 'annual_return', 'annual_volatility', 'target_price',
+                  'recommendation', 'market_cap', 'sector', 'industry', 'pe_ratio', 'forward_pe',
+                  'upside_potential', 'sharpe_ratio']
+SENTIMENT_COLUMNS = list(SENTIMENT_DEFAULTS)
+
+def _market_frame(market_data):
+    """One row per symbol with the scalar market fields"""
+    return pd.DataFrame.from_dict(market_data, orient='index', columns=MARKET_COLUMNS)
+
+# Market record fields read from ticker .info, with the default used when a key is missing
+INFO_FIELDS = {
+    'target_price': ('targetMeanPrice', None),
+    'recommendation': ('recommendationMean', None),
+    'market_cap': ('marketCap', None),
+    'sector': ('sector', 'Unknown'),
+    'industry': ('industry', 'Unknown'),
+    'pe_ratio': ('trailingPE', None),
+    'forward_pe': ('forwardPE', None),
+}
+_EMPTY_INFO = {}
+
+def _derive_metrics(current_prices, annual_returns, annual_volatilities, infos, risk_free_rate):
+    """
+    Market record table for the fetched symbols (rows in current_prices order)
+    
+    Info fields are gathered column by column; upside potential (0 without an analyst
+    target) and Sharpe ratio (0 without volatility) are then derived for all rows at once.
+    """
+    symbols = list(current_prices)
+    symbol_infos = [infos.get(symbol) or _EMPTY_INFO for symbol in symbols]
+    
+    df = pd.DataFrame({
+        'symbol': symbols,
+        'current_price': np.fromiter(current_prices.values(), dtype=float, count=len(symbols)),
+        'annual_return': annual_returns.reindex(symbols).to_numpy(dtype=float),
+        'annual_volatility': annual_volatilities.reindex(symbols).to_numpy(dtype=float),
+        **{col: [info.get(key, default) for info in symbol_infos] for col, (key, default) in INFO_FIELDS.items()}
+    }, index=symbols)
+    
+    price = df['current_price'].to_numpy()
+    target = pd.to_numeric(df['target_price'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    ann_ret = df['annual_return'].to_numpy()
+    ann_vol = df['annual_volatility'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['upside_potential'] = np.where(target != 0, (target - price) / price, 0.0)
+        df['sharpe_ratio'] = np.where(ann_vol > 0, (ann_ret - risk_free_rate) / ann_vol, 0.0)
+    
+    return df[MARKET_COLUMNS]
+
+def _with_sector_codes(market_df):
+    """Add integer sector codes (-1 when missing) to a market table; returns (table, sector categories)"""
+    sectors = pd.Categorical(market_df['sector'])
+    return market_df.assign(sector_code=sectors.codes), sectors.categories.rename('sector')
+
+def _pairwise_cov(R):
+    """
+    Sample covariance of the columns of R (dates x symbols) over pairwise complete rows,
+    matching DataFrame.cov(): NaN where a pair shares fewer than two observations
+    
+    One np.cov call when R has no gaps; otherwise three matrix products over the
+    zero-filled values and the presence mask replace pandas' per-pair loop.
+    """
+    present = ~np.isnan(R)
+    if present.all():
+        return np.atleast_2d(np.cov(R, rowvar=False)) if R.shape[0] > 1 else np.full((R.shape[1],) * 2, np.nan)
+    
+    X = np.where(present, R, 0.0)
+    M = present.astype(np.float64)
+    n_obs = M.T @ M                  # Shared observations per pair
+    sums = X.T @ M                   # sums[i, j]: sum of column i over rows where j is present
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = (X.T @ X - sums * sums.T / n_obs) / (n_obs - 1)
+    cov[n_obs < 2] = np.nan
+    return cov
+
+def _ledoit_wolf_shrinkage(X):
+    """
+    Ledoit-Wolf optimal shrinkage intensity towards a scaled identity for the
+    demeaned observations X (samples x features): sklearn.covariance.ledoit_wolf_shrinkage,
+    or the same formula computed here when scikit-learn is not installed
+    """
+    n_samples, n_features = X.shape
+    if n_samples == 0 or n_features == 0:
+        return 0.0
+    if SKLEARN_AVAILABLE:
+        return float(ledoit_wolf_shrinkage(X, assume_centered=True))
+    
+    X2 = X ** 2
+    emp_cov_trace = X2.sum(axis=0) / n_samples
+    mu = emp_cov_trace.sum() / n_features
+    beta_ = np.sum(X2.T @ X2)
+    delta_ = np.sum((X.T @ X) ** 2) / n_samples ** 2
+    beta = (beta_ / n_samples - delta_) / (n_features * n_samples)
+    delta = (delta_ - 2.0 * mu * emp_cov_trace.sum() + n_features * mu ** 2) / n_features
+    beta = min(beta, delta)
+    return 0.0 if beta == 0 else beta / delta
+
+def _closes_cache_paths(symbols):
+    """Paths of today's closes matrix (values, labels) for this exact symbol list"""
+    key = hashlib.md5('|'.join(symbols).encode()).hexdigest()
+    stem = os.path.join(MARKET_DATA_CACHE_DIR, f"closes_{date.today().isoformat()}_{key}")
+    return f"{stem}.npy", f"{stem}_labels.npz"
+
+def _save_closes_matrix(symbols, closes):
+    """Persist the closes matrix as a raw .npy (memory-mappable) plus its date/symbol labels"""
+    if closes.empty:
+        return
+    values_path, labels_path = _closes_cache_paths(symbols)
+    try:
+        os.makedirs(MARKET_DATA_CACHE_DIR, exist_ok=True)
+        for path, write in ((values_path, lambda f: np.save(f, closes.to_numpy(dtype=np.float64))),
+                            (labels_path, lambda f: np.savez(f, dates=closes.index.to_numpy(dtype='datetime64[ns]'),
+                                                             symbols=np.array(closes.columns, dtype=str)))):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Could not cache price matrix: {e}")
+
+def _load_closes_matrix(symbols):
+    """Today's saved closes matrix for this symbol list, memory-mapped read-only, or None"""
+    values_path, labels_path = _closes_cache_paths(symbols)
+    try:
+        values = np.load(values_path, mmap_mode='r')
+        with np.load(labels_path) as labels:
+            dates, columns = labels['dates'], labels['symbols'].tolist()
+    except (OSError, ValueError, KeyError):
+        return None
+    return pd.DataFrame(values, index=pd.DatetimeIndex(dates), columns=columns, copy=False)
+
+def _calendar_close(hist):
+    """Close prices indexed by calendar date (timezone dropped, so US and European listings line up)"""
+    close = hist['Close']
+    if getattr(close.index, 'tz', None) is not None:
+        close = close.tz_localize(None)
+    return close.groupby(close.index.normalize()).last()
+
+def _sentiment_frame(sentiment_data):
+    """One row per symbol with the sentiment fields, keyed by a 'symbol' column"""
+    df = pd.DataFrame.from_dict(sentiment_data, orient='index', columns=SENTIMENT_COLUMNS)
+    return df.rename_axis('symbol').reset_index()
+
 class TigroPortfolioOptimizer:
     """Complete portfolio optimization system with sentiment integration"""
     
-    def __init__(self):
+    def __init__(self, log_level=logging.INFO):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(log_level)
+        
         # System parameters based on user requirements
         self.risk_free_rate = 0.05  # 5% risk-free rate
         self.standard_position_size_usd = 2000  # Standard position size
@@ -30,12 +229,23 @@ class TigroPortfolioOptimizer:
         self.target_return_increase = 0.02  # +2pp target
         self.new_cash_available = 10000  # $10K new investment
         self.reserved_cash = 10000  # $10K to keep in reserve
+        self.info_workers = 8  # Concurrent .info requests per batch
+        self.use_shrinkage = True  # Ledoit-Wolf shrink the returns covariance
         
         # Portfolio data
         self.current_portfolio = None
         self.universe_data = None
         self.market_data = {}
         self.sentiment_data = {}
+        self._market_df, self._sector_categories = _with_sector_codes(_market_frame({}))
+        self._sentiment_df = _sentiment_frame({})
+        self._closes = pd.DataFrame()  # Close prices, dates × symbols
+        self._returns = pd.DataFrame()  # Daily simple returns, dates × symbols
+        self._annual_cov = None  # Annualized returns covariance, built lazily from _returns
+        self._sigma = None  # Same covariance as a dense float64 ndarray (missing pairs = 0)
+        self._shrinkage = 0.0  # Ledoit-Wolf intensity applied to the last covariance
+        self._shrinkage_cache = {}  # Fitted intensity per (symbols, returns shape, last date)
+        self._markowitz_qp = None  # OSQP problem reused while Σ and the sector layout are unchanged
         
     def parse_european_number(self, value_str):
         """Parse European number format (1.234,56 -> 1234.56)"""
@@ -55,25 +265,15 @@ class TigroPortfolioOptimizer:
     def load_portfolio(self, portfolio_file):
         """Load current portfolio from CSV"""
         print("📊 Loading current portfolio...")
-        df = pd.read_csv(portfolio_file, sep=';', skiprows=2, nrows=14)
-        
-        portfolio_data = []
-        for _, row in df.iterrows():
-            if pd.notna(row['Simbolo']) and row['Simbolo'] != 'Totale':
-                symbol = row['Simbolo'].split('.')[0]
-                if symbol.startswith('1'):
-                    symbol = symbol[1:]
-                
-                portfolio_data.append({
-                    'symbol': symbol,
-                    'name': row['Titolo'],
-                    'quantity': self.parse_european_number(row['Quantità']),
-                    'avg_cost': self.parse_european_number(row['P.zo medio di carico']),
-                    'current_value_eur': self.parse_european_number(row['Valore di mercato €']),
-                    'return_pct': self.parse_european_number(row['Var%'])
-                })
-        
-        self.current_portfolio = pd.DataFrame(portfolio_data)
+        df = _read_portfolio_csv(portfolio_file, os.path.getmtime(portfolio_file))
+        
+        self.current_portfolio = portfolio_frame(df, {
+            'quantity': 'Quantità',
+            'avg_cost': 'P.zo medio di carico',
+            'current_value_eur': 'Valore di mercato €',
+            'return_pct': 'Var%'
+        }).reset_index(drop=True)
+        
         print(f"✅ Loaded {len(self.current_portfolio)} positions")
         return self.current_portfolio
     
@@ -84,87 +284,223 @@ class TigroPortfolioOptimizer:
         print(f"✅ Loaded {len(self.universe_data)} stocks in universe")
         return self.universe_data
     
-    def fetch_market_data_robust(self, symbols, batch_size=10, delay=1):
-        """Fetch market data with robust error handling"""
-        print(f"📈 Fetching market data for {len(symbols)} symbols...")
+    def _fetch_info(self, symbol, session=None):
+        """Fetch ticker metadata (disk-cached), returning an empty dict when it is unavailable"""
+        try:
+            return symbol, cached_info(symbol, session) or {}
+        except Exception:
+            return symbol, {}  # Continue with empty info if fails
+    
+    def _download_closes(self, symbols, batch_size, delay, session):
+        """
+        Fetch histories and .info in batches
         
-        data = {}
+        Returns:
+            Tuple of (closes matrix, current prices, infos, failed symbols)
+        """
         failed_symbols = []
+        closes = {}
+        current_prices = {}
+        infos = {}
         
-        for i in range(0, len(symbols), batch_size):
-            batch = symbols[i:i + batch_size]
-            print(f"  Processing batch {i//batch_size + 1}/{(len(symbols)-1)//batch_size + 1}")
+        batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+        
+        def download(batch, wait):
+            """Historical data (6 months for analysis) for a whole batch in one multi-ticker request"""
+            time.sleep(wait)  # Spacing between batch requests, spent off the main thread
+            return download_histories(batch, '6mo', session)
+        
+        # Double-buffered: the next batch's histories download while this batch's .info
+        # requests and processing run
+        prefetch = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        pending = prefetch.submit(download, batches[0], 0) if batches else None
+        
+        for b, batch in enumerate(batches):
+            self.logger.debug("  Processing batch %d/%d", b + 1, len(batches))
+            
+            try:
+                histories = pending.result()
+            except Exception as e:
+                self.logger.warning(f"⚠️ Batch download failed ({str(e)[:50]}), fetching symbols individually")
+                histories = {}
+            
+            if b + 1 < len(batches):
+                pending = prefetch.submit(download, batches[b + 1], delay)
+            
+            # .info is one blocking request per symbol: fetch the whole batch concurrently
+            with ThreadPoolExecutor(max_workers=self.info_workers, thread_name_prefix="info") as executor:
+                infos.update(executor.map(lambda s: self._fetch_info(s, session), batch))
             
             for symbol in batch:
                 try:
-                    ticker = yf.Ticker(symbol)
-                    
-                    # Get historical data (6 months for analysis)
-                    hist = ticker.history(period='6mo')
-                    
-                    # Get current info (with error handling for missing data)
-                    info = {}
-                    try:
-                        info = ticker.info
-                    except:
-                        info = {}  # Continue with empty info if fails
+                    hist = histories.get(symbol)
+                    if hist is None:
+                        hist = cached_history(symbol, '6mo', session)
                     
-                    if not hist.empty:
-                        current_price = hist['Close'].iloc[-1]
-                        
-                        # Calculate basic metrics
-                        returns = hist['Close'].pct_change().dropna()
-                        
-                        data[symbol] = {
-                            'price_data': hist,
-                            'current_price': current_price,
-                            'returns': returns,
-                            'annual_return': returns.mean() * 252 if len(returns) > 20 else 0,
-                            'annual_volatility': returns.std() * np.sqrt(252) if len(returns) > 20 else 0,
-                            'target_price': info.get('targetMeanPrice', None),
-                            'recommendation': info.get('recommendationMean', None),
-                            'market_cap': info.get('marketCap', None),
-                            'sector': info.get('sector', 'Unknown'),
-                            'industry': info.get('industry', 'Unknown'),
-                            'pe_ratio': info.get('trailingPE', None),
-                            'forward_pe': info.get('forwardPE', None),
-                            'symbol': symbol
-                        }
-                        
-                        # Calculate upside potential
-                        if data[symbol]['target_price']:
-                            data[symbol]['upside_potential'] = (data[symbol]['target_price'] - current_price) / current_price
-                        else:
-                            data[symbol]['upside_potential'] = 0
-                        
-                        # Calculate Sharpe ratio
-                        if data[symbol]['annual_volatility'] > 0:
-                            data[symbol]['sharpe_ratio'] = (data[symbol]['annual_return'] - self.risk_free_rate) / data[symbol]['annual_volatility']
-                        else:
-                            data[symbol]['sharpe_ratio'] = 0
-                        
-                        print(f"    ✅ {symbol}: ${current_price:.2f}")
+                    # Bulk downloads pad every symbol to the union of dates, so the last row
+                    # is NaN for listings that have not printed the latest session yet
+                    last_closes = hist['Close'].dropna() if not hist.empty else hist
+                    if not last_closes.empty:
+                        current_prices[symbol] = last_closes.iloc[-1]  # Last actual close
+                        closes[symbol] = _calendar_close(hist)
+                        self.logger.debug("    ✅ %s: $%.2f", symbol, current_prices[symbol])
                     else:
                         failed_symbols.append(symbol)
-                        print(f"    ❌ {symbol}: No data")
+                        self.logger.debug("    ❌ %s: No data", symbol)
                         
                 except Exception as e:
                     failed_symbols.append(symbol)
-                    print(f"    ⚠️ {symbol}: {str(e)[:50]}...")
-                
-                time.sleep(0.3)  # Small delay between requests
+                    self.logger.debug("    ⚠️ %s: %.50s...", symbol, e)
             
-            if i + batch_size < len(symbols):
-                print(f"  Waiting {delay}s before next batch...")
-                time.sleep(delay)
+            self.logger.info(f"  Fetched {len(current_prices)}/{min((b + 1) * batch_size, len(symbols))} symbols")
+        
+        prefetch.shutdown()
+        closes = pd.concat(closes, axis=1) if closes else pd.DataFrame()
+        return closes, current_prices, infos, failed_symbols
+    
+    def fetch_market_data_robust(self, symbols, batch_size=10, delay=1):
+        """Fetch market data with robust error handling"""
+        print(f"📈 Fetching market data for {len(symbols)} symbols...")
+        
+        session = get_yfinance_session()
+        
+        # An earlier run today saved the closes matrix for this symbol list: memory-map it
+        # instead of reading every symbol's history again (.info still comes from its cache)
+        closes = _load_closes_matrix(symbols)
+        if closes is not None:
+            print(f"  📂 Using today's cached price matrix ({closes.shape[1]} symbols)")
+            current_prices = closes.ffill().iloc[-1].to_dict()
+            failed_symbols = [symbol for symbol in symbols if symbol not in current_prices]
+            with ThreadPoolExecutor(max_workers=self.info_workers, thread_name_prefix="info") as executor:
+                infos = dict(executor.map(lambda s: self._fetch_info(s, session), list(current_prices)))
+            
+            # Symbols that failed when the matrix was saved are retried rather than frozen for the day
+            if failed_symbols:
+                retry_closes, retry_prices, retry_infos, failed_symbols = self._download_closes(
+                    failed_symbols, batch_size, delay, session)
+                infos.update(retry_infos)
+                if retry_prices:
+                    order = [symbol for symbol in symbols if symbol in current_prices or symbol in retry_prices]
+                    current_prices.update(retry_prices)
+                    current_prices = {symbol: current_prices[symbol] for symbol in order}
+                    closes = pd.concat([closes, retry_closes], axis=1)[order]
+                    _save_closes_matrix(symbols, closes)
+        else:
+            closes, current_prices, infos, failed_symbols = self._download_closes(symbols, batch_size, delay, session)
+            _save_closes_matrix(symbols, closes)
+        
+        # Closes as one dates × symbols matrix; each column's returns span its own trading
+        # days (gaps from other exchanges' holidays are bridged), then reduce all columns at once
+        self._closes = closes
+        self._returns = self._closes / self._closes.ffill().shift(1) - 1
+        enough_history = self._returns.count() > 20
+        annual_returns = (self._returns.mean() * 252).where(enough_history, 0)
+        annual_volatilities = (self._returns.std() * np.sqrt(252)).where(enough_history, 0)
+        
+        market_df = _derive_metrics(current_prices, annual_returns, annual_volatilities,
+                                    infos, self.risk_free_rate)
+        data = market_df.to_dict(orient='index')
+        self._market_df, self._sector_categories = _with_sector_codes(market_df)
         
         print(f"✅ Successfully fetched {len(data)} symbols")
         if failed_symbols:
             print(f"❌ Failed symbols ({len(failed_symbols)}): {failed_symbols[:10]}...")
         
         self.market_data = data
+        self._annual_cov = None
+        self._sigma = None
         return data, failed_symbols
     
+    def annual_covariance(self):
+        """
+        Annualized covariance of daily returns across all fetched symbols
+        
+        Built once per market data fetch from the shared returns matrix. Covariances use
+        pairwise complete observations, so one short history does not truncate every other pair.
+        With use_shrinkage, ~6 months of daily data for dozens of symbols is too little for a
+        well-conditioned estimate: the matrix is shrunk towards a scaled identity with the
+        Ledoit-Wolf intensity (missing observations count as zero deviation in that estimate).
+        """
+        if self._annual_cov is None:
+            R = self._returns.to_numpy(dtype=np.float64)
+            cov = _pairwise_cov(R) * 252
+            self._shrinkage = 0.0
+            
+            if self.use_shrinkage and cov.size:
+                # Re-runs over the same returns window reuse the fitted intensity
+                key = (tuple(self._returns.columns), self._returns.shape, self._returns.index[-1])
+                if key not in self._shrinkage_cache:
+                    demeaned = np.nan_to_num(R - np.nanmean(R, axis=0))
+                    self._shrinkage_cache[key] = _ledoit_wolf_shrinkage(demeaned)
+                self._shrinkage = self._shrinkage_cache[key]
+                target = np.nansum(np.diag(cov)) / len(cov)
+                cov = cov * (1 - self._shrinkage)
+                cov[np.diag_indices_from(cov)] += self._shrinkage * target
+            
+            self._annual_cov = pd.DataFrame(cov, index=self._returns.columns, columns=self._returns.columns)
+            self._sigma = np.nan_to_num(cov)
+        
+        return self._annual_cov
+    
+    def solve_markowitz(self, mu, sigma, sector_idx, max_sector=None):
+        """
+        Mean-variance weights: minimize 0.5·w'Σw - μ'w, fully invested and long-only,
+        with each sector's total weight capped at max_sector
+        
+        With OSQP installed the problem is factored once and kept: re-solving for a new μ
+        with the same Σ and sectors only updates the linear term and warm-starts from the
+        previous solution. Without OSQP it falls back to SLSQP.
+        
+        Args:
+            mu: Expected annual returns (ndarray, length n)
+            sigma: Annualized covariance matrix (n x n ndarray, e.g. self._sigma)
+            sector_idx: Integer sector code per asset (-1 for no sector, e.g. _market_df['sector_code'])
+            max_sector: Cap per sector (defaults to self.max_sector_weight)
+            
+        Returns:
+            Weights ndarray, or None if the problem is infeasible
+        """
+        mu = np.asarray(mu, dtype=np.float64)
+        sigma = np.asarray(sigma, dtype=np.float64)
+        sector_idx = np.asarray(sector_idx, dtype=np.int64)
+        max_sector = self.max_sector_weight if max_sector is None else max_sector
+        n_assets = len(mu)
+        
+        sectors = np.unique(sector_idx[sector_idx >= 0])
+        A_sector = (sector_idx[np.newaxis, :] == sectors[:, np.newaxis]).astype(np.float64)
+        
+        if OSQP_AVAILABLE:
+            qp = self._markowitz_qp
+            if qp is None or qp[1] != max_sector or not (np.array_equal(qp[2], sigma) and
+                                                         np.array_equal(qp[3], sector_idx)):
+                # Rows: budget, per-asset bounds, sector caps
+                A = np.vstack([np.ones((1, n_assets)), np.eye(n_assets), A_sector])
+                l = np.concatenate([[1.0], np.zeros(n_assets), np.full(len(sectors), -np.inf)])
+                u = np.concatenate([[1.0], np.ones(n_assets), np.full(len(sectors), max_sector)])
+                prob = osqp.OSQP()
+                prob.setup(P=sparse.csc_matrix(np.triu(sigma)), q=-mu, A=sparse.csc_matrix(A), l=l, u=u,
+                           eps_abs=1e-8, eps_rel=1e-8, max_iter=20000, polish=True, verbose=False)
+                qp = self._markowitz_qp = (prob, max_sector, sigma.copy(), sector_idx.copy())
+            else:
+                qp[0].update(q=-mu)
+            
+            res = qp[0].solve()
+            status = str(res.info.status).lower()
+            if status == 'solved':
+                return np.clip(res.x, 0.0, None)
+            if 'infeasible' in status and 'inaccurate' not in status:
+                return None
+        
+        # SLSQP fallback with analytic gradients
+        constraints = [{'type': 'eq', 'fun': lambda w: np.sum(w) - 1.0, 'jac': lambda w: np.ones(n_assets)}]
+        if len(sectors):
+            constraints.append({'type': 'ineq', 'fun': lambda w: max_sector - A_sector @ w, 'jac': lambda w: -A_sector})
+        
+        result = minimize(lambda w: 0.5 * w @ sigma @ w - mu @ w, np.full(n_assets, 1.0 / n_assets),
+                          jac=lambda w: sigma @ w - mu, method='SLSQP', bounds=[(0.0, 1.0)] * n_assets,
+                          constraints=constraints, options={'maxiter': 1000, 'ftol': 1e-12})
+        return result.x if result.success else None
+    
     def load_sentiment_data(self):
         """Load latest sentiment data from database"""
         print("🧠 Loading sentiment analysis data...")
@@ -179,22 +515,11 @@ class TigroPortfolioOptimizer:
         print(f"  Using: {latest_file}")
         
         try:
-            sentiment_df = pd.read_csv(latest_file)
-            
-            # Create sentiment dictionary
-            sentiment_dict = {}
-            for _, row in sentiment_df.iterrows():
-                symbol = row.get('symbol', '').strip().upper()
-                if symbol:
-                    sentiment_dict[symbol] = {
-                        'sentiment_score': row.get('sentiment_score', 0),
-                        'sentiment_label': row.get('sentiment_label', 'neutral'),
-                        'confidence': row.get('confidence', 0),
-                        'article_count': row.get('article_count', 0)
-                    }
+            sentiment_dict = _load_sentiment_cached(latest_file, os.path.getmtime(latest_file))
             
             print(f"✅ Loaded sentiment data for {len(sentiment_dict)} symbols")
             self.sentiment_data = sentiment_dict
+            self._sentiment_df = _sentiment_frame(sentiment_dict)
             return sentiment_dict
             
         except Exception as e:
@@ -210,57 +535,41 @@ class TigroPortfolioOptimizer:
         # Basic portfolio metrics
         total_value = self.current_portfolio['current_value_eur'].sum()
         
-        # Add market data to portfolio analysis
-        portfolio_analysis = []
-        for _, position in self.current_portfolio.iterrows():
-            symbol = position['symbol']
-            
-            analysis_row = {
-                'symbol': symbol,
-                'name': position['name'],
-                'current_value_eur': position['current_value_eur'],
-                'current_value_usd': position['current_value_eur'] * 1.1,  # Rough EUR/USD conversion
-                'return_pct': position['return_pct'],
-                'weight': position['current_value_eur'] / total_value
-            }
-            
-            # Add market data if available
-            if symbol in self.market_data:
-                market_info = self.market_data[symbol]
-                analysis_row.update({
-                    'current_price': market_info['current_price'],
-                    'annual_return': market_info['annual_return'],
-                    'annual_volatility': market_info['annual_volatility'],
-                    'sharpe_ratio': market_info['sharpe_ratio'],
-                    'sector': market_info['sector'],
-                    'upside_potential': market_info['upside_potential'],
-                    'target_price': market_info['target_price']
-                })
-            
-            # Add sentiment data if available
-            if symbol in self.sentiment_data:
-                sentiment_info = self.sentiment_data[symbol]
-                analysis_row.update({
-                    'sentiment_score': sentiment_info['sentiment_score'],
-                    'sentiment_label': sentiment_info['sentiment_label']
-                })
-            
-            portfolio_analysis.append(analysis_row)
-        
-        analysis_df = pd.DataFrame(portfolio_analysis)
+        # Join market and sentiment data onto the positions (left joins keep positions without data)
+        market_cols = ['symbol', 'current_price', 'annual_return', 'annual_volatility',
+                       'sharpe_ratio', 'sector', 'upside_potential', 'target_price', 'sector_code']
+        analysis_df = (
+            self.current_portfolio[['symbol', 'name', 'current_value_eur']]
+            .assign(current_value_usd=lambda d: d['current_value_eur'] * 1.1,  # Rough EUR/USD conversion
+                    return_pct=self.current_portfolio['return_pct'],
+                    weight=lambda d: d['current_value_eur'] / total_value)
+            .merge(self._market_df[market_cols], on='symbol', how='left')
+            .merge(self._sentiment_df[['symbol', 'sentiment_score', 'sentiment_label']], on='symbol', how='left')
+        )
         
         # Portfolio-level calculations
         valid_positions = analysis_df[analysis_df['annual_return'].notna()]
         
         if len(valid_positions) > 0:
             portfolio_return = (valid_positions['annual_return'] * valid_positions['weight']).sum()
-            portfolio_volatility = np.sqrt((valid_positions['annual_volatility'] * valid_positions['weight'])**2).sum()
+            # sqrt(w' Σ w); pairs without overlapping history contribute no covariance
+            symbols = valid_positions['symbol'].to_numpy()
+            sigma = self.annual_covariance().reindex(index=symbols, columns=symbols).fillna(0).to_numpy()
+            w = valid_positions['weight'].to_numpy()
+            portfolio_volatility = np.sqrt(max(w @ sigma @ w, 0.0))
             portfolio_sharpe = (portfolio_return - self.risk_free_rate) / portfolio_volatility if portfolio_volatility > 0 else 0
         else:
             portfolio_return = portfolio_volatility = portfolio_sharpe = None
         
-        # Sector concentration analysis
-        sector_weights = analysis_df.groupby('sector')['weight'].sum().sort_values(ascending=False)
+        # Sector concentration analysis: bincount over the sector codes assigned at fetch time
+        codes = analysis_df.pop('sector_code').fillna(-1).to_numpy(dtype=np.int64)
+        has_sector = codes >= 0
+        n_sectors = len(self._sector_categories)
+        sector_totals = np.bincount(codes[has_sector], weights=analysis_df['weight'].to_numpy()[has_sector],
+                                    minlength=n_sectors)
+        held_sectors = np.bincount(codes[has_sector], minlength=n_sectors) > 0
+        sector_weights = pd.Series(sector_totals[held_sectors], index=self._sector_categories[held_sectors],
+                                   name='weight').sort_values(ascending=False)
         
         portfolio_metrics = {
             'total_value_eur': total_value,
@@ -298,68 +607,35 @@ class TigroPortfolioOptimizer:
         print("UNIVERSE SCREENING")
         print("="*60)
         
-        opportunities = []
-        
-        for symbol in self.universe_data['Ticker']:
-            if symbol in self.market_data:
-                market_info = self.market_data[symbol]
-                
-                # Base opportunity data
-                opp = {
-                    'symbol': symbol,
-                    'current_price': market_info['current_price'],
-                    'annual_return': market_info['annual_return'],
-                    'annual_volatility': market_info['annual_volatility'],
-                    'sharpe_ratio': market_info['sharpe_ratio'],
-                    'upside_potential': market_info['upside_potential'],
-                    'target_price': market_info['target_price'],
-                    'sector': market_info['sector'],
-                    'market_cap': market_info['market_cap'],
-                    'pe_ratio': market_info['pe_ratio']
-                }
-                
-                # Add sentiment score if available
-                if symbol in self.sentiment_data:
-                    sentiment_info = self.sentiment_data[symbol]
-                    opp.update({
-                        'sentiment_score': sentiment_info['sentiment_score'],
-                        'sentiment_label': sentiment_info['sentiment_label'],
-                        'sentiment_confidence': sentiment_info['confidence']
-                    })
-                else:
-                    opp.update({
-                        'sentiment_score': 0,
-                        'sentiment_label': 'neutral',
-                        'sentiment_confidence': 0
-                    })
-                
-                # Calculate composite score (combine financial metrics + sentiment)
-                financial_score = 0
-                if opp['sharpe_ratio'] and not np.isnan(opp['sharpe_ratio']):
-                    financial_score += min(opp['sharpe_ratio'], 2) * 0.4  # Cap at 2, weight 40%
-                if opp['upside_potential'] and not np.isnan(opp['upside_potential']):
-                    financial_score += min(max(opp['upside_potential'], -0.5), 1) * 0.4  # Cap between -50% and 100%, weight 40%
-                
-                sentiment_score = opp['sentiment_score'] * 0.2  # Weight 20%
-                
-                opp['composite_score'] = financial_score + sentiment_score
-                opportunities.append(opp)
-        
-        opportunities_df = pd.DataFrame(opportunities)
-        
-        # Filter and rank opportunities
-        # Remove current portfolio holdings for new investments
-        current_symbols = set(self.current_portfolio['symbol'])
-        new_opportunities = opportunities_df[~opportunities_df['symbol'].isin(current_symbols)]
-        
-        # Quality filters
+        # Universe tickers with market data (universe order), plus sentiment (neutral when missing)
+        opp_cols = ['symbol', 'current_price', 'annual_return', 'annual_volatility', 'sharpe_ratio',
+                    'upside_potential', 'target_price', 'sector', 'market_cap', 'pe_ratio']
+        opportunities_df = (
+            self.universe_data[['Ticker']].rename(columns={'Ticker': 'symbol'})
+            .merge(self._market_df[opp_cols], on='symbol', how='inner')
+            .merge(self._sentiment_df[['symbol', 'sentiment_score', 'sentiment_label', 'confidence']]
+                   .rename(columns={'confidence': 'sentiment_confidence'}), on='symbol', how='left')
+        )
+        opportunities_df = opportunities_df.fillna({'sentiment_score': 0, 'sentiment_label': 'neutral',
+                                                    'sentiment_confidence': 0})
+        
+        # Composite score: financial metrics (Sharpe capped at 2, upside capped to [-50%, 100%],
+        # 40% each; missing values score 0) + sentiment (20%)
+        sharpe = pd.to_numeric(opportunities_df['sharpe_ratio'], errors='coerce').fillna(0).to_numpy()
+        upside = pd.to_numeric(opportunities_df['upside_potential'], errors='coerce').fillna(0).to_numpy()
+        sentiment = pd.to_numeric(opportunities_df['sentiment_score'], errors='coerce').to_numpy()
+        financial_score = 0.4 * np.minimum(sharpe, 2) + 0.4 * np.clip(upside, -0.5, 1)
+        opportunities_df['composite_score'] = financial_score + 0.2 * sentiment
+        
+        # Filter and rank opportunities: quality filters, excluding current holdings
         quality_filter = (
-            (new_opportunities['annual_volatility'] < 0.8) &  # Not too volatile
-            (new_opportunities['current_price'] > 5) &  # No penny stocks
-            (new_opportunities['market_cap'].fillna(0) > 1e9)  # Min $1B market cap
+            (opportunities_df['annual_volatility'] < 0.8) &  # Not too volatile
+            (opportunities_df['current_price'] > 5) &  # No penny stocks
+            (pd.to_numeric(opportunities_df['market_cap'], errors='coerce').fillna(0) > 1e9) &  # Min $1B market cap
+            ~opportunities_df['symbol'].isin(self.current_portfolio['symbol'])  # New investments only
         )
         
-        filtered_opportunities = new_opportunities[quality_filter]
+        filtered_opportunities = opportunities_df[quality_filter]
         top_opportunities = filtered_opportunities.nlargest(20, 'composite_score')
         
         print(f"✅ Screened {len(opportunities_df)} total opportunities")
@@ -373,10 +649,14 @@ class TigroPortfolioOptimizer:
 
 def main():
     """Main execution function"""
+    # Per-symbol fetch details are debug-level: pass --verbose to see them
+    log_level = logging.DEBUG if '--verbose' in sys.argv else logging.INFO
+    logging.basicConfig(level=log_level, format='%(message)s')
+    
     print("🚀 Starting Tigro Portfolio Optimization System")
     print("=" * 80)
     
-    optimizer = TigroPortfolioOptimizer()
+    optimizer = TigroPortfolioOptimizer(log_level)
     
     # Load data
     portfolio = optimizer.load_portfolio('actual-portfolio-master.csv')
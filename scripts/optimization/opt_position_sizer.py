@@ -4,11 +4,29 @@ Position Sizing Engine - Component E1
 Converts optimal weights to specific share quantities and trade recommendations
 """
 
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import pandas as pd
 import numpy as np
 import logging
+from functools import lru_cache
 from typing import Dict, List, Tuple, Optional
 
+from financial.fin_market_data import portfolio_frame
+
+@lru_cache(maxsize=512)
+def _format_rationale(template, performance, vol_desc, sentiment_template, sentiment_trend,
+                      sent_bp, ret_bp, cw_bp, tw_bp):
+    """
+    Fill a rationale template from basis-point quantized inputs (memoized: the same
+    action/bucket/weight combinations recur across runs in one process)
+    """
+    return template.format(perf=performance, vol=vol_desc, sent=sentiment_template.format(sent_bp / 1e4),
+                           trend=sentiment_trend, ret=ret_bp / 1e4, current=cw_bp / 1e4,
+                           target=tw_bp / 1e4, change=abs(tw_bp - cw_bp) / 1e4)
+
 class PositionSizer:
     """Convert optimal portfolio weights to actionable trade recommendations"""
     
@@ -52,38 +70,24 @@ class PositionSizer:
             Dict with current positions
         """
         try:
-            df = pd.read_csv(portfolio_file, sep=';', skiprows=2, nrows=20)
+            df = pd.read_csv(portfolio_file, sep=';', skiprows=2, nrows=20,
+                             usecols=['Simbolo', 'Titolo', 'Quantità', 'Valore di mercato €', 'Valore di carico', 'Var%'],
+                             dtype='string', engine='c')
             
-            positions = {}
-            total_value_eur = 0
+            positions_df = portfolio_frame(df, {
+                'current_shares': 'Quantità',
+                'current_value_eur': 'Valore di mercato €',
+                'cost_basis_eur': 'Valore di carico',
+                'return_pct': 'Var%'
+            })
+            positions_df['return_pct'] /= 100
             
-            for _, row in df.iterrows():
-                if pd.notna(row['Simbolo']) and row['Simbolo'] != 'Totale':
-                    # Clean symbol
-                    symbol = row['Simbolo'].split('.')[0]
-                    if symbol.startswith('1'):
-                        symbol = symbol[1:]
-                    
-                    # Parse values
-                    quantity = self.parse_european_number(row['Quantità'])
-                    current_value_eur = self.parse_european_number(row['Valore di mercato €'])
-                    cost_basis_eur = self.parse_european_number(row['Valore di carico'])
-                    return_pct = self.parse_european_number(row['Var%'])
-                    
-                    positions[symbol] = {
-                        'name': row['Titolo'],
-                        'current_shares': quantity,
-                        'current_value_eur': current_value_eur,
-                        'cost_basis_eur': cost_basis_eur,
-                        'return_pct': return_pct / 100,
-                        'current_weight': 0  # Will calculate after total
-                    }
-                    
-                    total_value_eur += current_value_eur
+            total_value_eur = positions_df['current_value_eur'].sum()
+            positions_df['current_weight'] = positions_df['current_value_eur'] / total_value_eur
             
-            # Calculate current weights
-            for symbol in positions:
-                positions[symbol]['current_weight'] = positions[symbol]['current_value_eur'] / total_value_eur
+            # A repeated symbol keeps its last row (its value still counts towards the total)
+            positions = (positions_df.drop_duplicates('symbol', keep='last')
+                         .set_index('symbol').to_dict(orient='index'))
             
             self.logger.info(f"📊 Loaded {len(positions)} current positions")
             self.logger.info(f"💰 Total portfolio value: €{total_value_eur:,.2f}")
@@ -117,125 +121,92 @@ class PositionSizer:
         
         self.logger.info(f"💰 Total target portfolio: ${total_target_usd:,.2f}")
         
+        # Sizing inputs as columns, one row per symbol with usable market data
+        symbols = [symbol for symbol in optimal_weights.index
+                   if symbol in market_data and market_data[symbol]['success']]
+        positions = current_positions['positions']
+        held = pd.Index(symbols).isin(list(positions))
+        held_positions = pd.DataFrame.from_dict(
+            positions, orient='index', columns=['current_shares', 'current_value_eur', 'return_pct']
+        ).reindex(symbols).fillna(0.0)
+        
+        neutral_sentiment = {'sentiment_score': 0.0, 'trend': 'neutral'}
+        sentiment_infos = [sentiment_data.get(symbol, neutral_sentiment) if sentiment_data else neutral_sentiment
+                           for symbol in symbols]
+        
+        current_price_usd = np.array([market_data[symbol]['current_price'] for symbol in symbols], dtype=float)
+        volatility = np.array([market_data[symbol].get('volatility', 0.0) for symbol in symbols], dtype=float)
+        sentiment_score = np.array([info['sentiment_score'] for info in sentiment_infos], dtype=float)
+        target_weight = optimal_weights.loc[symbols].to_numpy(dtype=float)
+        current_shares = np.where(held, held_positions['current_shares'].to_numpy(), 0)
+        current_value_usd = np.where(held, held_positions['current_value_eur'].to_numpy() * self.eur_usd_rate, 0)
+        current_weight = np.where(held, current_value_usd / total_current_usd, 0)
+        current_return = np.where(held, held_positions['return_pct'].to_numpy(), 0)
+        
+        # Target shares and trade sizes
+        target_value_usd = target_weight * total_target_usd
+        target_shares = target_value_usd / current_price_usd
+        shares_change = target_shares - current_shares
+        value_change_usd = shares_change * current_price_usd
+        
+        # Fix floating point precision: treat very small numbers as zero
+        effective_target_shares = np.where(np.abs(target_shares) > 1e-10, target_shares, 0.0)
+        
+        # Action decision table, first matching rule wins (rules 5-6 only see reductions):
+        # strong winners (20%+ gain) that are large positions (>15%) with positive sentiment
+        # prefer stops over selling, so only small reductions (>80% kept) become holds
+        strong_keeper = (current_return > 0.20) & (current_weight > 0.15) & (sentiment_score > 0.1)
+        rules = [
+            np.abs(shares_change) < 0.1,                                       # Minimal change
+            (shares_change > 0) & (current_shares == 0),                       # New position
+            (shares_change > 0) & (current_return > 0),                        # Top-up of a winner: backup only
+            shares_change > 0,                                                 # Add to a loser
+            effective_target_shares < current_shares * 0.1,                    # Selling most/all (90%+)
+            strong_keeper & (effective_target_shares > current_shares * 0.8),  # Keep strong performer
+        ]
+        rule_actions = np.array(['HOLD', 'BUY', 'TOP_UP_BACKUP', 'ADD', 'SELL', 'HOLD', 'TRIM'])
+        rule = np.select(rules, np.arange(len(rules)), default=len(rules))
+        action = rule_actions[rule]
+        
+        # Calculate stop loss
+        stop_loss_price = current_price_usd * (1 - self.stop_loss_pct)
+        
+        rationales = self._smart_rationales(rule, action, current_return, volatility, sentiment_score,
+                                            [info['trend'] for info in sentiment_infos], current_weight, target_weight)
+        
+        # Compile recommendations
         trade_recommendations = {}
-        
-        for symbol in optimal_weights.index:
-            if symbol not in market_data or not market_data[symbol]['success']:
-                continue
-            
-            current_price_usd = market_data[symbol]['current_price']
-            target_weight = optimal_weights[symbol]
-            target_value_usd = target_weight * total_target_usd
-            
-            # Current position info
-            current_shares = 0
-            current_value_usd = 0
-            current_weight = 0
-            
-            if symbol in current_positions['positions']:
-                pos = current_positions['positions'][symbol]
-                current_shares = pos['current_shares']
-                current_value_usd = pos['current_value_eur'] * self.eur_usd_rate
-                current_weight = current_value_usd / total_current_usd
-            
-            # Calculate target shares
-            target_shares = target_value_usd / current_price_usd
-            shares_change = target_shares - current_shares
-            value_change_usd = shares_change * current_price_usd
-            
-            # Get additional context for smart decisions
-            current_return = 0
-            if symbol in current_positions['positions']:
-                current_return = current_positions['positions'][symbol]['return_pct']
-            
-            volatility = market_data[symbol].get('volatility', 0.0)
-            sentiment_info = sentiment_data.get(symbol, {'sentiment_score': 0.0, 'trend': 'neutral'}) if sentiment_data else {'sentiment_score': 0.0, 'trend': 'neutral'}
-            
-            # Determine action with intelligent logic
-            action = 'HOLD'
-            
-            if abs(shares_change) < 0.1:  # Minimal change
-                action = 'HOLD'
-                rationale = self._generate_smart_rationale(symbol, 'HOLD', current_return, volatility, sentiment_info, current_weight, target_weight)
-            elif shares_change > 0:
-                if current_shares == 0:
-                    action = 'BUY'
-                    rationale = self._generate_smart_rationale(symbol, 'BUY', current_return, volatility, sentiment_info, current_weight, target_weight)
-                else:
-                    # Check positive return constraint - use as backup only
-                    if current_return > 0:
-                        action = 'TOP_UP_BACKUP'  # Mark for lower priority
-                        rationale = f"BACKUP: Positive return stock ({current_return:+.1%}) - consider only if budget remains after new opportunities"
-                    else:
-                        action = 'ADD'
-                        rationale = self._generate_smart_rationale(symbol, 'ADD', current_return, volatility, sentiment_info, current_weight, target_weight)
-            else:
-                # Smart logic for reducing positions - be conservative with winners
-                is_strong_winner = current_return > 0.20  # 20%+ gain
-                is_large_position = current_weight > 0.15  # Large position
-                has_positive_sentiment = sentiment_info['sentiment_score'] > 0.1
-                
-                # Fix floating point precision: treat very small numbers as zero
-                effective_target_shares = target_shares if abs(target_shares) > 1e-10 else 0.0
-                
-                # Primary check: if target is essentially zero or very small, it's a SELL
-                if effective_target_shares < current_shares * 0.1:  # Selling most/all (90%+)
-                    action = 'SELL'
-                    rationale = self._generate_smart_rationale(symbol, 'SELL', current_return, volatility, sentiment_info, current_weight, target_weight)
-                elif is_strong_winner and is_large_position and has_positive_sentiment:
-                    # For strong performers with positive sentiment, prefer stops over selling
-                    if effective_target_shares > current_shares * 0.8:  # Only small reduction
-                        action = 'HOLD'
-                        rationale = f"Strong performer ({current_return:.1%} gain) with positive sentiment - maintain position with stop loss protection rather than selling"
-                    else:
-                        action = 'TRIM'
-                        rationale = self._generate_smart_rationale(symbol, 'TRIM', current_return, volatility, sentiment_info, current_weight, target_weight)
-                else:
-                    action = 'TRIM'
-                    rationale = self._generate_smart_rationale(symbol, 'TRIM', current_return, volatility, sentiment_info, current_weight, target_weight)
-            
-            # Calculate stop loss
-            stop_loss_price = current_price_usd * (1 - self.stop_loss_pct)
-            
-            # Compile recommendation
+        for k, symbol in enumerate(symbols):
             trade_recommendations[symbol] = {
                 'name': market_data[symbol].get('info', {}).get('longName', symbol),
-                'current_price': current_price_usd,
-                'current_shares': current_shares,
-                'target_shares': target_shares,
-                'shares_change': shares_change,
-                'current_weight': current_weight,
-                'target_weight': target_weight,
-                'current_value_usd': current_value_usd,
-                'target_value_usd': target_value_usd,
-                'value_change_usd': value_change_usd,
-                'action': action,
-                'rationale': rationale,
-                'stop_loss_price': stop_loss_price,
-                'volatility': market_data[symbol].get('volatility', 0.0)
+                'current_price': current_price_usd[k],
+                'current_shares': current_shares[k],
+                'target_shares': target_shares[k],
+                'shares_change': shares_change[k],
+                'current_weight': current_weight[k],
+                'target_weight': target_weight[k],
+                'current_value_usd': current_value_usd[k],
+                'target_value_usd': target_value_usd[k],
+                'value_change_usd': value_change_usd[k],
+                'action': str(action[k]),
+                'rationale': rationales[k],
+                'stop_loss_price': stop_loss_price[k],
+                'volatility': volatility[k]
             }
         
-        # Calculate cash usage with breakdown by action type
-        total_purchases = sum(
-            rec['value_change_usd'] for rec in trade_recommendations.values()
-            if rec['value_change_usd'] > 0
-        )
-        
-        total_sales = sum(
-            abs(rec['value_change_usd']) for rec in trade_recommendations.values()
-            if rec['value_change_usd'] < 0
-        )
-        
-        # Break down sales by action type
-        trim_proceeds = sum(
-            abs(rec['value_change_usd']) for rec in trade_recommendations.values()
-            if rec['value_change_usd'] < 0 and rec['action'] == 'TRIM'
-        )
-        
-        sell_proceeds = sum(
-            abs(rec['value_change_usd']) for rec in trade_recommendations.values()
-            if rec['value_change_usd'] < 0 and rec['action'] == 'SELL'
-        )
+        # Calculate cash usage with breakdown by action type (sales split by TRIM/SELL)
+        total_purchases = total_sales = trim_proceeds = sell_proceeds = 0.0
+        for rec in trade_recommendations.values():
+            value_change = rec['value_change_usd']
+            if value_change > 0:
+                total_purchases += value_change
+            elif value_change < 0:
+                total_sales -= value_change
+                rec_action = rec['action']
+                if rec_action == 'TRIM':
+                    trim_proceeds -= value_change
+                elif rec_action == 'SELL':
+                    sell_proceeds -= value_change
         
         # Net Cash Position = Total Purchases (negative) - Cash from Sales (positive)
         # When cash flows out for purchases, the net position should be negative
@@ -270,26 +241,26 @@ class PositionSizer:
         """
         actions = {'BUY': [], 'ADD': [], 'HOLD': [], 'TRIM': [], 'SELL': [], 'TOP_UP_BACKUP': []}
         
-        # First pass: categorize all actions
+        totals = {action: 0.0 for action in actions}
+        
+        # Single pass: categorize all actions, keeping per-action totals and
+        # primary cash usage (exclude backups) as we go
+        primary_purchases = sales_proceeds = 0.0
         for symbol, rec in trade_recommendations.items():
-            actions[rec['action']].append({
+            action = rec['action']
+            value_change = rec['value_change_usd']
+            actions[action].append({
                 'symbol': symbol,
                 'name': rec['name'],
                 'shares_change': rec['shares_change'],
-                'value_change_usd': rec['value_change_usd'],
+                'value_change_usd': value_change,
                 'rationale': rec['rationale']
             })
-        
-        # Calculate primary cash usage (exclude backups)
-        primary_purchases = sum(
-            item['value_change_usd'] for action in ['BUY', 'ADD'] 
-            for item in actions[action] if item['value_change_usd'] > 0
-        )
-        
-        sales_proceeds = sum(
-            abs(item['value_change_usd']) for action in ['TRIM', 'SELL'] 
-            for item in actions[action] if item['value_change_usd'] < 0
-        )
+            totals[action] += value_change
+            if action in ('BUY', 'ADD') and value_change > 0:
+                primary_purchases += value_change
+            elif action in ('TRIM', 'SELL') and value_change < 0:
+                sales_proceeds -= value_change
         
         net_primary_cost = primary_purchases - sales_proceeds
         remaining_budget = self.new_cash_usd - net_primary_cost
@@ -307,6 +278,7 @@ class PositionSizer:
                         **backup,
                         'rationale': f"TOP UP: {backup['rationale']}"
                     })
+                    totals['ADD'] += backup['value_change_usd']
                     remaining_budget -= backup['value_change_usd']
                     processed_backups += 1
                     
@@ -319,7 +291,7 @@ class PositionSizer:
             if action != 'TOP_UP_BACKUP':  # Don't include unprocessed backups in final summary
                 summary[action] = {
                     'count': len(items),
-                    'total_value': sum(item['value_change_usd'] for item in items),
+                    'total_value': totals[action],
                     'items': items
                 }
         
@@ -328,7 +300,7 @@ class PositionSizer:
             'backups_available': len(actions['TOP_UP_BACKUP']),
             'backups_processed': processed_backups,
             'remaining_budget': remaining_budget,
-            'total_backup_value': sum(item['value_change_usd'] for item in actions['TOP_UP_BACKUP'])
+            'total_backup_value': totals['TOP_UP_BACKUP']
         }
         
         return summary
@@ -347,98 +319,87 @@ class PositionSizer:
         """
         updated_recs = trade_recommendations.copy()
         
-        for symbol, rec in updated_recs.items():
-            volatility = rec['volatility']
-            current_price = rec['current_price']
-            
-            # Dynamic stop based on volatility
-            volatility_stop_pct = min(volatility * volatility_factor, 0.15)  # Max 15%
-            dynamic_stop_price = current_price * (1 - volatility_stop_pct)
-            
-            # Use the more conservative of fixed 8% or dynamic stop
-            conservative_stop = min(rec['stop_loss_price'], dynamic_stop_price)
-            
-            rec['dynamic_stop_price'] = dynamic_stop_price
-            rec['final_stop_price'] = conservative_stop
-            rec['stop_loss_pct'] = (current_price - conservative_stop) / current_price
+        symbols = list(updated_recs)
+        volatility = np.fromiter((updated_recs[s]['volatility'] for s in symbols), float, count=len(symbols))
+        current_price = np.fromiter((updated_recs[s]['current_price'] for s in symbols), float, count=len(symbols))
+        fixed_stop_price = np.fromiter((updated_recs[s]['stop_loss_price'] for s in symbols), float, count=len(symbols))
+        
+        # Dynamic stop based on volatility (where() keeps min()'s handling of missing volatility)
+        volatility_stop_pct = np.where(volatility * volatility_factor > 0.15, 0.15, volatility * volatility_factor)  # Max 15%
+        dynamic_stop_price = current_price * (1 - volatility_stop_pct)
+        
+        # Use the more conservative of fixed 8% or dynamic stop
+        conservative_stop = np.where(dynamic_stop_price < fixed_stop_price, dynamic_stop_price, fixed_stop_price)
+        stop_loss_pct = (current_price - conservative_stop) / current_price
+        
+        for k, symbol in enumerate(symbols):
+            rec = updated_recs[symbol]
+            rec['dynamic_stop_price'] = dynamic_stop_price[k]
+            rec['final_stop_price'] = conservative_stop[k]
+            rec['stop_loss_pct'] = stop_loss_pct[k]
         
         return updated_recs
     
-    def _generate_smart_rationale(self, symbol: str, action: str, current_return: float, 
-                                volatility: float, sentiment_info: Dict, 
-                                current_weight: float, target_weight: float) -> str:
+    def _smart_rationales(self, rule: np.ndarray, action: np.ndarray, current_return: np.ndarray,
+                          volatility: np.ndarray, sentiment_score: np.ndarray, sentiment_trend: List[str],
+                          current_weight: np.ndarray, target_weight: np.ndarray) -> List[str]:
         """
-        Generate intelligent AI-like rationale based on all available information
+        Generate intelligent AI-like rationales based on all available information
+        
+        Descriptors and the message template are chosen for all rows at once with
+        np.select (rule is the index of the action rule that fired in
+        calculate_target_positions); only the final string formatting runs per row.
         
-        Args:
-            symbol: Stock symbol
-            action: Recommended action
-            current_return: Current position return
-            volatility: Stock volatility
-            sentiment_info: Sentiment data
-            current_weight: Current portfolio weight
-            target_weight: Target portfolio weight
-            
         Returns:
-            Intelligent rationale string
+            Rationale string per row
         """
-        sentiment_score = sentiment_info['sentiment_score']
-        sentiment_trend = sentiment_info['trend']
-        
         # Performance categorization
-        if current_return > 0.20:
-            performance = "strong winner"
-        elif current_return > 0.05:
-            performance = "solid performer"
-        elif current_return > -0.05:
-            performance = "stable position"
-        else:
-            performance = "underperformer"
+        performance = np.select(
+            [current_return > 0.20, current_return > 0.05, current_return > -0.05],
+            ["strong winner", "solid performer", "stable position"], default="underperformer")
         
         # Volatility assessment
-        if volatility > 0.30:
-            vol_desc = "high volatility"
-        elif volatility > 0.20:
-            vol_desc = "moderate volatility"
-        else:
-            vol_desc = "low volatility"
+        vol_desc = np.select([volatility > 0.30, volatility > 0.20],
+                             ["high volatility", "moderate volatility"], default="low volatility")
         
         # Sentiment assessment
-        if sentiment_score > 0.1:
-            sentiment_desc = f"positive sentiment ({sentiment_score:.2f})"
-        elif sentiment_score < -0.1:
-            sentiment_desc = f"negative sentiment ({sentiment_score:.2f})"
-        else:
-            sentiment_desc = "neutral sentiment"
-        
-        # Generate action-specific rationale
-        if action == 'BUY':
-            return f"New opportunity: {vol_desc} stock with {sentiment_desc} and {sentiment_trend} trend. Optimal allocation at {target_weight:.1%}"
-        
-        elif action == 'ADD':
-            return f"Increase {performance} from {current_weight:.1%} to {target_weight:.1%} - {sentiment_desc} supports expansion with {sentiment_trend} momentum"
-        
-        elif action == 'HOLD':
-            if current_return > 0.15:
-                return f"Maintain {performance} ({current_return:+.1%}) - {sentiment_desc} with {sentiment_trend} trend supports current {current_weight:.1%} allocation"
-            else:
-                return f"Hold steady - balanced risk/reward profile with {sentiment_desc} and {vol_desc} characteristics"
-        
-        elif action == 'TRIM':
-            weight_change = target_weight - current_weight
-            if current_return > 0.10:
-                return f"Take profits on {performance} ({current_return:+.1%}) - reduce by {abs(weight_change):.1%} while maintaining core position due to {sentiment_desc}"
-            else:
-                return f"Rebalance overweight position - reduce {vol_desc} exposure from {current_weight:.1%} to {target_weight:.1%} given {sentiment_desc}"
-        
-        elif action == 'SELL':
-            if current_return < -0.10:
-                return f"Exit {performance} ({current_return:+.1%}) - {sentiment_desc} with {sentiment_trend} trend suggests limited recovery potential"
-            else:
-                return f"Portfolio rebalancing - reallocate capital from {vol_desc} position to higher-conviction opportunities"
-        
-        else:
-            return f"Optimize allocation based on {sentiment_desc} and {vol_desc} profile"
+        sentiment_desc = np.select([sentiment_score > 0.1, sentiment_score < -0.1],
+                                   ["positive sentiment ({0:.2f})", "negative sentiment ({0:.2f})"],
+                                   default="neutral sentiment")
+        
+        # Action-specific templates, first match wins
+        templates = np.select([
+            rule == 2,
+            rule == 5,
+            action == 'BUY',
+            action == 'ADD',
+            (action == 'HOLD') & (current_return > 0.15),
+            action == 'HOLD',
+            (action == 'TRIM') & (current_return > 0.10),
+            action == 'TRIM',
+            (action == 'SELL') & (current_return < -0.10),
+            action == 'SELL',
+        ], [
+            "BACKUP: Positive return stock ({ret:+.1%}) - consider only if budget remains after new opportunities",
+            "Strong performer ({ret:.1%} gain) with positive sentiment - maintain position with stop loss protection rather than selling",
+            "New opportunity: {vol} stock with {sent} and {trend} trend. Optimal allocation at {target:.1%}",
+            "Increase {perf} from {current:.1%} to {target:.1%} - {sent} supports expansion with {trend} momentum",
+            "Maintain {perf} ({ret:+.1%}) - {sent} with {trend} trend supports current {current:.1%} allocation",
+            "Hold steady - balanced risk/reward profile with {sent} and {vol} characteristics",
+            "Take profits on {perf} ({ret:+.1%}) - reduce by {change:.1%} while maintaining core position due to {sent}",
+            "Rebalance overweight position - reduce {vol} exposure from {current:.1%} to {target:.1%} given {sent}",
+            "Exit {perf} ({ret:+.1%}) - {sent} with {trend} trend suggests limited recovery potential",
+            "Portfolio rebalancing - reallocate capital from {vol} position to higher-conviction opportunities",
+        ], default="Optimize allocation based on {sent} and {vol} profile")
+        
+        # Cache key: descriptors plus numbers rounded to basis points (text is formatted from those)
+        sent_bp, ret_bp, cw_bp, tw_bp = (np.rint(values * 1e4).tolist() for values in
+                                         (sentiment_score, current_return, current_weight, target_weight))
+        return [
+            _format_rationale(str(templates[k]), str(performance[k]), str(vol_desc[k]), str(sentiment_desc[k]),
+                              sentiment_trend[k], sent_bp[k], ret_bp[k], cw_bp[k], tw_bp[k])
+            for k in range(len(rule))
+        ]
 
 def main():
     """Test position sizing engine"""
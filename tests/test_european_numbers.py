@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Test script to verify European number parsing for portfolio CSV values"""
+
+import os
+import sys
+import pandas as pd
+
+# Add scripts/ to path for imports
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from financial.fin_market_data import MarketDataCollector, parse_european_numbers
+
+# Input -> expected value (the split/replace rules the broker exports were parsed with)
+CASES = {
+    '1.234,56': 1234.56,
+    '12,5': 12.5,
+    '-1.234,56': -1234.56,
+    '1234.56': 1234.56,
+    ' 12,5 ': 12.5,
+    '+3,5': 3.5,
+    '1.2345,6': 12345.6,
+    '12.34.56,7': 123456.7,
+    ',5': 0.5,
+    '1.234,': 1234.0,
+    ',': 0.0,
+    '1,234,567': 0.0,
+    '': 0.0,
+    'abc': 0.0,
+}
+
+def test_parse_european_number():
+    """Scalar parser used by the collector and the rigorous portfolio master"""
+    for value, expected in CASES.items():
+        assert MarketDataCollector.parse_european_number(None, value) == expected, value
+
+def test_parse_european_numbers_matches_scalar():
+    """Vectorized column parser agrees with the scalar parser"""
+    parsed = parse_european_numbers(pd.Series(list(CASES)))
+    for value, result in zip(CASES, parsed):
+        assert result == MarketDataCollector.parse_european_number(None, value), value
+
+def main():
+    """Run the European number checks"""
+    for test in (test_parse_european_number, test_parse_european_numbers_matches_scalar):
+        try:
+            test()
+            print(f"  ✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"  ❌ {test.__name__}: {e}")
+
+if __name__ == "__main__":
+    main()